@@ -1,14 +1,30 @@
 # Quiz bot (Korean vocabulary)
 import asyncio
+import base64
+import bisect
 import csv
+import gzip
+import hashlib
+import heapq
+import hmac
+import io
 import json
 import logging
+import mmap
 import os
 import random
+import re
+import sqlite3
+import struct
 import tempfile
-from datetime import datetime
+import time
+import zlib
+from array import array
+from collections import OrderedDict, deque
+from contextlib import aclosing, asynccontextmanager
+from datetime import datetime, timedelta
 from pathlib import Path
-from typing import Set
+from typing import Awaitable, Callable, Set
 
 try:
     from dotenv import load_dotenv
@@ -19,16 +35,25 @@ except ImportError:
 import aiosqlite
 from openpyxl import Workbook
 from aiogram import Bot, Dispatcher, F
-from aiogram.filters import CommandStart, Command
+from aiogram.exceptions import (
+    TelegramBadRequest,
+    TelegramForbiddenError,
+    TelegramNetworkError,
+    TelegramRetryAfter,
+    TelegramServerError,
+)
+from aiogram.filters import CommandStart, Command, CommandObject
 from aiogram.types import (
-    BufferedInputFile,
     CallbackQuery,
+    FSInputFile,
     InlineKeyboardButton,
+    InputFile,
     InlineKeyboardMarkup,
     KeyboardButton,
     Message,
     ReplyKeyboardMarkup,
 )
+from aiogram.methods import SendMessage
 
 # =======================
 # CONFIGURATION
@@ -40,6 +65,48 @@ from aiogram.types import (
 BOT_TOKEN = os.environ.get("BOT_TOKEN", "")
 DB_PATH = os.environ.get("DB_PATH", "quiz_bot.db")
 WORDS_FILE = os.environ.get("WORDS_FILE", "words.json")
+# words.json is reloaded when its mtime/size changes, checked every this many
+# seconds (0 disables; admins can always reload from the panel)
+WORDS_WATCH_INTERVAL = int(os.environ.get("WORDS_WATCH_INTERVAL", "30"))
+# compiled, mmap-able copy of the deck; every bot process on the host maps
+# the same file instead of keeping its own copy of the words
+WORDS_STORE_PATH = os.environ.get(
+    "WORDS_STORE_PATH", str(Path(DB_PATH).with_suffix(".words.bin"))
+)
+
+# SQLite connection pool: one writer connection plus DB_READERS read-only
+# connections sharing the same WAL-journaled file
+DB_READERS = int(os.environ.get("DB_READERS", "4"))
+DB_CACHE_SIZE_KIB = int(os.environ.get("DB_CACHE_SIZE_KIB", "16384"))
+DB_MMAP_SIZE = int(os.environ.get("DB_MMAP_SIZE", str(256 * 1024 * 1024)))
+DB_STATEMENT_CACHE = 256
+# "IN (...)" lists are split to stay well below SQLite's bound-parameter limit
+SQLITE_MAX_PARAMS = 500
+
+# how many users' state (level, streaks, score) is kept in memory
+USER_CACHE_SIZE = int(os.environ.get("USER_CACHE_SIZE", "10000"))
+# how many words' rendered question text and option labels are kept in memory
+RENDER_CACHE_SIZE = int(os.environ.get("RENDER_CACHE_SIZE", "10000"))
+# how many users' SRS review queues are kept in memory
+SRS_CACHE_SIZE = int(os.environ.get("SRS_CACHE_SIZE", "2000"))
+
+# answers log is written behind: rows are batched and flushed every
+# ANSWER_LOG_BATCH_SIZE rows or ANSWER_LOG_FLUSH_MS milliseconds, producers wait
+# once ANSWER_LOG_MAX_PENDING rows are queued
+ANSWER_LOG_BATCH_SIZE = int(os.environ.get("ANSWER_LOG_BATCH_SIZE", "200"))
+ANSWER_LOG_FLUSH_MS = int(os.environ.get("ANSWER_LOG_FLUSH_MS", "500"))
+ANSWER_LOG_MAX_PENDING = int(os.environ.get("ANSWER_LOG_MAX_PENDING", "10000"))
+# answers are scored in the background after the feedback is sent; a write
+# failing with a SQLite operational error ("database is locked", I/O) is tried
+# this many times with exponential backoff
+ANSWER_PERSIST_ATTEMPTS = 5
+# question messages already answered, remembered in memory so a second tap is
+# ignored without a database round trip (answered_questions keeps them all)
+ANSWERED_CACHE_SIZE = int(os.environ.get("ANSWERED_CACHE_SIZE", "100000"))
+# answered_questions rows only need to outlive a stale keyboard, so they are
+# dropped after ANSWERED_QUESTIONS_TTL_HOURS (checked every hour)
+ANSWERED_QUESTIONS_TTL_HOURS = int(os.environ.get("ANSWERED_QUESTIONS_TTL_HOURS", "72"))
+ANSWERED_QUESTIONS_PRUNE_CHUNK = 5000
 
 ADMIN_USERNAMES = {"Sunnatulla_Mamur_Korean", "Sunnatulla_Mamur"}
 
@@ -47,9 +114,57 @@ LEVEL_BEGINNER = "초급"
 LEVEL_INTERMEDIATE = "중급"
 LEVEL_ADVANCED = "고급"
 QUIZ_MODE_AI = "ai"
+QUIZ_MODE_SRS = "srs"
 
 LEVEL_ORDER = [LEVEL_BEGINNER, LEVEL_INTERMEDIATE, LEVEL_ADVANCED]
-QUIZ_MODES = [LEVEL_BEGINNER, LEVEL_INTERMEDIATE, LEVEL_ADVANCED, QUIZ_MODE_AI]
+QUIZ_MODES = [LEVEL_BEGINNER, LEVEL_INTERMEDIATE, LEVEL_ADVANCED, QUIZ_MODE_AI, QUIZ_MODE_SRS]
+
+# raw answers older than ANSWERS_RETENTION_DAYS are folded into daily rollups
+# and removed from the live database (0 keeps them forever); with
+# ANSWERS_ARCHIVE_PATH set they are copied to that SQLite file first
+ANSWERS_RETENTION_DAYS = int(os.environ.get("ANSWERS_RETENTION_DAYS", "0"))
+ANSWERS_ARCHIVE_PATH = os.environ.get("ANSWERS_ARCHIVE_PATH", "")
+ANSWERS_RETENTION_CHUNK = int(os.environ.get("ANSWERS_RETENTION_CHUNK", "5000"))
+ANSWERS_RETENTION_INTERVAL = int(os.environ.get("ANSWERS_RETENTION_INTERVAL", "3600"))
+
+# Bot API rejects uploads over 50 MB, exported files are split into parts
+# of at most this many bytes
+TELEGRAM_UPLOAD_LIMIT = int(os.environ.get("TELEGRAM_UPLOAD_LIMIT", str(49 * 1024 * 1024)))
+# database pages copied per online-backup step
+DB_BACKUP_PAGES_PER_STEP = 1024
+
+# broadcasts are sent by BROADCAST_WORKERS concurrent senders sharing a
+# BROADCAST_RATE messages/second budget (Bot API allows about 30/s overall)
+BROADCAST_RATE = float(os.environ.get("BROADCAST_RATE", "28"))
+BROADCAST_WORKERS = int(os.environ.get("BROADCAST_WORKERS", "16"))
+BROADCAST_MAX_RETRIES = 5
+# blocked chats are written to the database in batches of this size
+BROADCAST_BLOCKED_BATCH = 500
+# broadcast jobs save their cursor after every batch of this many users, so
+# at most one batch is resent after a crash
+BROADCAST_CHECKPOINT_BATCH = 200
+
+# how often (seconds) the in-memory leaderboards are compared with SQL
+LEADERBOARD_CHECK_INTERVAL = int(os.environ.get("LEADERBOARD_CHECK_INTERVAL", "3600"))
+
+# rendered top-10 sections are reused for at most this many seconds even if
+# no score change invalidated them
+RANKING_CACHE_TTL = int(os.environ.get("RANKING_CACHE_TTL", "60"))
+
+# every word keeps its DISTRACTOR_NEIGHBOURS most similar-looking words of the
+# same level; two of them are drawn as wrong options for each question.
+# Candidates are the DISTRACTOR_WINDOW words on each side in jamo-sorted order
+# (same beginning), reversed order (same ending) and category order
+DISTRACTOR_NEIGHBOURS = 6
+DISTRACTOR_WINDOW = 4
+
+# spaced repetition (SRS mode, SM-2 with right/wrong grades): a word answered
+# wrong comes back after SRS_RELEARN_MINUTES; when a random draw hits an
+# already seen word SRS_NEW_WORD_TRIES times, the earliest review is pulled in
+SRS_INITIAL_EASE = 2.5
+SRS_MIN_EASE = 1.3
+SRS_RELEARN_MINUTES = 10
+SRS_NEW_WORD_TRIES = 8
 
 # how many in-a-row are needed to change level
 LEVEL_UP_CORRECT_STREAK = 20
@@ -59,100 +174,496 @@ LEVEL_DOWN_WRONG_STREAK = 3
 # WORD DATA
 # =======================
 
-# each entry: {
-#   "id": int,
+# each word (a dict while loading, then a WordRecord view of the store): {
+#   "id": int (stable, see _stable_word_id()),
 #   "korean": str,
 #   "uzbek": str,
 #   "english": str,
-#   "options": [str, str, str],
-#   "correct_index": int (0-based),
+#   "russian": str,
+#   "category": str | None (optional meaning group from words.json),
+#   "distractors": tuple[str, ...] (similar words of the level, nearest first),
 #   "level": LEVEL_*
 # }
-WORDS = []  # will be filled by _load_words()
+# filled by load_words() at startup and replaced as a whole on reload:
+# WORDS is the WordStore, WORDS_BY_LEVEL maps levels to views of it and
+# WORDS_BY_ID (a WordIndex) also keeps words retired from the deck so that
+# questions already sent can still be answered
+WORDS = []
+WORDS_BY_LEVEL = {level: [] for level in LEVEL_ORDER}
+WORDS_BY_ID = {}
 
 
-def _load_words():
-    global WORDS
-    WORDS = []
-    word_id = 1
+def _pretty_korean_word(raw: str) -> str:
+    # hide technical numeric suffixes like "안녕하세요 2" from the user
+    parts = raw.rsplit(" ", 1)
+    if len(parts) == 2 and parts[1].isdigit():
+        return parts[0]
+    return raw
 
-    words_file_path = Path(WORDS_FILE)
-    if not words_file_path.exists():
-        raise FileNotFoundError(
-            f"Words file '{WORDS_FILE}' not found. Please create it with words for each level."
-        )
 
-    with open(words_file_path, "r", encoding="utf-8") as f:
-        words_data = json.load(f)
+def _hangul_syllables(text: str) -> tuple:
+    """Split Hangul syllables into (lead, vowel, tail) jamo indexes; other
+    characters are kept as they are."""
+    syllables = []
+    for ch in text:
+        code = ord(ch) - 0xAC00
+        if 0 <= code < 11172:
+            syllables.append((code // 588, (code % 588) // 28, code % 28))
+        else:
+            syllables.append(ch)
+    return tuple(syllables)
 
-    for level in LEVEL_ORDER:
-        if level not in words_data:
-            logging.warning(f"No words found for level: {level}")
-            continue
 
-        level_words = words_data[level]
-        if not level_words:
-            logging.warning(f"Empty word list for level: {level}")
-            continue
+def _jamo_key(syllables) -> str:
+    return "".join(
+        chr(0x1100 + s[0]) + chr(0x1161 + s[1]) + (chr(0x11A7 + s[2]) if s[2] else "")
+        if isinstance(s, tuple) else s
+        for s in syllables
+    )
 
-        # создаем список всех корейских слов этого уровня для генерации
-        # неправильных вариантов
-        all_korean_words = [w["korean"] for w in level_words]
 
-        for word_data in level_words:
-            korean = word_data["korean"]
-            uzbek = word_data["uzbek"]
-            english = word_data["english"]
-            russian = word_data["russian"]
+def _syllable_distance(a: tuple, b: tuple) -> float:
+    """Edit distance over syllables where substituting one Hangul syllable for
+    another costs the share of jamo that differ."""
+    prev = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        cur = [i]
+        for j, cb in enumerate(b, 1):
+            if ca == cb:
+                sub = 0
+            elif isinstance(ca, tuple) and isinstance(cb, tuple):
+                sub = ((ca[0] != cb[0]) + (ca[1] != cb[1]) + (ca[2] != cb[2])) / 3
+            else:
+                sub = 1
+            cur.append(min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + sub))
+        prev = cur
+    return prev[-1]
+
+
+def _build_distractor_index(level_words: list[dict]) -> None:
+    """Fill word["distractors"] for every word of one level.
+
+    Only a fixed window of neighbours in a few sort orders is compared, so
+    this is O(n log n) rather than all pairs; words in the same category get
+    a bonus.
+    """
+    count = len(level_words)
+    texts = [_pretty_korean_word(w["korean"]) for w in level_words]
+    syllables = [_hangul_syllables(t) for t in texts]
+    categories = [w.get("category") for w in level_words]
+    orders = [
+        sorted(range(count), key=lambda i: _jamo_key(syllables[i])),
+        sorted(range(count), key=lambda i: _jamo_key(syllables[i][::-1])),
+    ]
+    if any(categories):
+        orders.append(sorted(
+            range(count), key=lambda i: (categories[i] or "", _jamo_key(syllables[i]))
+        ))
+
+    candidates = [set() for _ in range(count)]
+    for order in orders:
+        for pos, i in enumerate(order):
+            candidates[i].update(order[max(0, pos - DISTRACTOR_WINDOW):pos + DISTRACTOR_WINDOW + 1])
+
+    for i, word in enumerate(level_words):
+        scored = []
+        for j in candidates[i]:
+            if texts[j] == texts[i]:
+                continue
+            distance = _syllable_distance(syllables[i], syllables[j])
+            if categories[i] and categories[i] == categories[j]:
+                distance -= 0.5
+            scored.append((distance, texts[j]))
+        scored.sort()
+        distractors = list(dict.fromkeys(text for _, text in scored))[:DISTRACTOR_NEIGHBOURS]
+        # tiny levels or runs of duplicates: top up with any other words
+        if len(distractors) < 2:
+            for text in random.sample(texts, min(count, 20)):
+                if text != texts[i] and text not in distractors:
+                    distractors.append(text)
+                if len(distractors) >= 2:
+                    break
+        word["distractors"] = tuple(distractors)
+
+
+WORD_FIELDS = ("korean", "uzbek", "english", "russian")
+_JSON_WHITESPACE = re.compile(r"[ \t\n\r]*")
+
+
+def _iter_word_entries(text: str):
+    """Yield (level, entry, line) for every entry of words.json in one pass.
+
+    The top-level object and the level lists are walked by hand and each
+    entry is decoded with raw_decode, so every entry keeps the line it
+    starts on for error messages.
+    """
+    decoder = json.JSONDecoder()
+    line, line_pos = 1, 0
+
+    def line_at(pos: int) -> int:
+        nonlocal line, line_pos
+        line += text.count("\n", line_pos, pos)
+        line_pos = pos
+        return line
+
+    def skip(pos: int) -> int:
+        return _JSON_WHITESPACE.match(text, pos).end()
+
+    def expect(pos: int, chars: str) -> str:
+        char = text[pos:pos + 1]
+        if not char or char not in chars:
+            raise RuntimeError(
+                f"{WORDS_FILE}:{line_at(pos)}: expected {' or '.join(repr(c) for c in chars)}"
+            )
+        return char
+
+    pos = skip(0)
+    expect(pos, "{")
+    pos = skip(pos + 1)
+    if text[pos:pos + 1] == "}":
+        return
+    while True:
+        expect(pos, '"')
+        level, pos = decoder.raw_decode(text, pos)
+        pos = skip(pos)
+        expect(pos, ":")
+        pos = skip(pos + 1)
+        expect(pos, "[")
+        pos = skip(pos + 1)
+        if text[pos:pos + 1] == "]":
+            pos += 1
+        else:
+            while True:
+                entry_line = line_at(pos)
+                entry, pos = decoder.raw_decode(text, pos)
+                yield level, entry, entry_line
+                pos = skip(pos)
+                if expect(pos, ",]") == "]":
+                    pos += 1
+                    break
+                pos = skip(pos + 1)
+        pos = skip(pos)
+        if expect(pos, ",}") == "}":
+            return
+        pos = skip(pos + 1)
 
-            # генерируем варианты ответов: правильный + 2 неправильных из того
-            # же уровня
-            wrong_candidates = [
-                w for w in all_korean_words if w != korean
-            ]
-            random.shuffle(wrong_candidates)
 
-            wrong1 = wrong_candidates[0] if wrong_candidates else korean
-            wrong2 = wrong_candidates[1] if len(
-                wrong_candidates) > 1 else korean
+def _stable_word_id(level: str, entry: dict) -> int:
+    """Content-derived word id: editing or reordering words.json doesn't
+    change the ids of the other words (53 bits, so it is exact in JSON
+    consumers too)."""
+    key = "\x1f".join([level, *(entry[field] for field in WORD_FIELDS)]).encode("utf-8")
+    return int.from_bytes(hashlib.blake2b(key, digest_size=8).digest(), "big") >> 11
 
-            options = [korean, wrong1, wrong2]
-            random.shuffle(options)
-            correct_index = options.index(korean)
 
-            WORDS.append(
+def _read_words(text: str) -> list[dict]:
+    """Validate and index the words.json text in one pass.
+
+    Returns the words in LEVEL_ORDER, then file order, with distractors.
+    """
+    words_by_level = {level: [] for level in LEVEL_ORDER}
+    problems = []
+    seen = {}
+    try:
+        for level, entry, line in _iter_word_entries(text):
+            if level not in words_by_level:
+                problems.append(f"line {line}: unknown level {level!r}")
+                continue
+            if not isinstance(entry, dict):
+                problems.append(f"line {line}: {level} entry is not an object")
+                continue
+            missing = [
+                field for field in WORD_FIELDS
+                if not isinstance(entry.get(field), str) or not entry[field].strip()
+            ]
+            if missing:
+                problems.append(
+                    f"line {line}: {level} {entry.get('korean')!r} is missing {', '.join(missing)}"
+                )
+                continue
+            # the same word with another meaning is a valid homonym
+            word_id = _stable_word_id(level, entry)
+            if word_id in seen:
+                problems.append(
+                    f"line {line}: {level} {entry['korean']!r} duplicates line {seen[word_id]}"
+                )
+                continue
+            seen[word_id] = line
+            words_by_level[level].append(
                 {
                     "id": word_id,
-                    "korean": korean,
-                    "uzbek": uzbek,
-                    "english": english,
-                    "russian": russian,
-                    "options": options,
-                    "correct_index": correct_index,
+                    "korean": entry["korean"],
+                    "uzbek": entry["uzbek"],
+                    "english": entry["english"],
+                    "russian": entry["russian"],
+                    "category": entry.get("category"),
                     "level": level,
                 }
             )
+    except json.JSONDecodeError as e:
+        raise RuntimeError(f"{WORDS_FILE}:{e.lineno}:{e.colno}: {e.msg}") from None
 
-            word_id += 1
+    for problem in problems[:50]:
+        logging.warning(f"{WORDS_FILE}: skipped {problem}")
+    if len(problems) > 50:
+        logging.warning(f"{WORDS_FILE}: ... and {len(problems) - 50} more problems")
 
-    if not WORDS:
+    words = []
+    for level in LEVEL_ORDER:
+        level_words = words_by_level[level]
+        if not level_words:
+            logging.warning(f"No words found for level: {level}")
+            continue
+        words.extend(level_words)
+        # неправильные варианты выбираются для каждого вопроса из похожих слов
+        _build_distractor_index(level_words)
+
+    if not words:
         raise RuntimeError(
             "No words loaded! Please add words to words.json file.")
 
     logging.info(
-        f"Loaded {len(WORDS)} words: "
-        f"{sum(1 for w in WORDS if w['level'] == LEVEL_BEGINNER)} 초급, "
-        f"{sum(1 for w in WORDS if w['level'] == LEVEL_INTERMEDIATE)} 중급, "
-        f"{sum(1 for w in WORDS if w['level'] == LEVEL_ADVANCED)} 고급"
+        f"Loaded {len(words)} words: "
+        + ", ".join(f"{len(words_by_level[level])} {level}" for level in LEVEL_ORDER)
     )
+    return words
 
 
-_load_words()
+class WordRecord:
+    """Read-only view of one word in a WordStore; word["korean"] etc. work
+    like the dicts the loader builds."""
 
-WORDS_BY_LEVEL = {
-    level: [w for w in WORDS if w["level"] == level] for level in LEVEL_ORDER
-}
-WORDS_BY_ID = {w["id"]: w for w in WORDS}
+    __slots__ = ("_store", "_pos")
+
+    def __init__(self, store: "WordStore", pos: int):
+        self._store = store
+        self._pos = pos
+
+    def __getitem__(self, key: str):
+        return self._store.field(self._pos, key)
+
+    def get(self, key: str, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+
+class WordStore:
+    """The deck in columnar form inside one read-only mmapped file.
+
+    Strings are interned into a single UTF-8 blob addressed by an offsets
+    column; ids, levels, text fields and distractor lists are fixed-width
+    columns. Words are grouped by level, so a level is a range of
+    positions. Files are written once (atomically replaced on reload) and
+    shared through the page cache by all processes that map them.
+    """
+
+    MAGIC = b"QBWORDS1"
+    TEXT_FIELDS = ("korean", "uzbek", "english", "russian", "category")
+    # magic, source digest, then word / string / distractor counts
+    HEADER = struct.Struct("<8s16sQQQ")
+
+    def __init__(self, buffer, digest: bytes):
+        self.digest = digest
+        self._buffer = buffer
+        view = memoryview(buffer)
+        _, _, count, strings, refs = self.HEADER.unpack_from(view, 0)
+        pos = self.HEADER.size
+        columns = {}
+        for name, fmt, length in self._layout(count, strings, refs):
+            size = array(fmt).itemsize * length
+            columns[name] = view[pos:pos + size].cast(fmt)
+            pos += size + (-size % 8)
+        self._ids = columns["ids"]
+        self._sorted_ids = columns["sorted_ids"]
+        self._sorted_pos = columns["sorted_pos"]
+        self._levels = columns["levels"]
+        self._level_bounds = columns["level_bounds"]
+        self._fields = columns["fields"]
+        self._distractor_offsets = columns["distractor_offsets"]
+        self._distractors = columns["distractors"]
+        self._string_offsets = columns["string_offsets"]
+        self._blob = view[pos:pos + self._string_offsets[strings]]
+
+    @staticmethod
+    def _layout(count: int, strings: int, refs: int) -> list[tuple[str, str, int]]:
+        return [
+            ("ids", "q", count),
+            ("sorted_ids", "q", count),
+            ("sorted_pos", "I", count),
+            ("levels", "B", count),
+            ("level_bounds", "I", len(LEVEL_ORDER) + 1),
+            ("fields", "I", count * len(WordStore.TEXT_FIELDS)),
+            ("distractor_offsets", "I", count + 1),
+            ("distractors", "I", refs),
+            ("string_offsets", "I", strings + 1),
+        ]
+
+    @classmethod
+    def write(cls, path: str, words: list[dict], digest: bytes) -> None:
+        """Compile words (in LEVEL_ORDER) into a store file at path."""
+        strings: dict[str, int] = {"": 0}
+
+        def intern(text: str | None) -> int:
+            return strings.setdefault(text or "", len(strings))
+
+        level_index = {level: idx for idx, level in enumerate(LEVEL_ORDER)}
+        columns = {name: array(fmt) for name, fmt, _ in cls._layout(0, 0, 0)}
+        columns["distractor_offsets"].append(0)
+        for word in words:
+            columns["ids"].append(word["id"])
+            columns["levels"].append(level_index[word["level"]])
+            columns["fields"].extend(intern(word[field]) for field in cls.TEXT_FIELDS)
+            columns["distractors"].extend(intern(text) for text in word["distractors"])
+            columns["distractor_offsets"].append(len(columns["distractors"]))
+        order = sorted(range(len(words)), key=lambda pos: words[pos]["id"])
+        columns["sorted_ids"].extend(words[pos]["id"] for pos in order)
+        columns["sorted_pos"].extend(order)
+        columns["level_bounds"].extend(
+            bisect.bisect_left(columns["levels"], idx) for idx in range(len(LEVEL_ORDER) + 1)
+        )
+        blob = bytearray()
+        columns["string_offsets"].append(0)
+        for text in strings:
+            blob += text.encode("utf-8")
+            columns["string_offsets"].append(len(blob))
+
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(cls.HEADER.pack(
+                cls.MAGIC, digest, len(words), len(strings), len(columns["distractors"])
+            ))
+            for name, _, _ in cls._layout(0, 0, 0):
+                data = columns[name].tobytes()
+                f.write(data + b"\0" * (-len(data) % 8))
+            f.write(blob)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def open(cls, path: str, digest: bytes) -> "WordStore | None":
+        """Map a store file; None if it is missing or built from another deck."""
+        try:
+            with open(path, "rb") as f:
+                buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            return None
+        if len(buffer) < cls.HEADER.size:
+            return None
+        magic, file_digest, _, _, _ = cls.HEADER.unpack_from(buffer, 0)
+        if magic != cls.MAGIC or file_digest != digest:
+            return None
+        return cls(buffer, digest)
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def __getitem__(self, pos: int) -> WordRecord:
+        if not 0 <= pos < len(self._ids):
+            raise IndexError(pos)
+        return WordRecord(self, pos)
+
+    def _string(self, idx: int) -> str:
+        return str(self._blob[self._string_offsets[idx]:self._string_offsets[idx + 1]], "utf-8")
+
+    def field(self, pos: int, key: str):
+        if key == "id":
+            return self._ids[pos]
+        if key == "level":
+            return LEVEL_ORDER[self._levels[pos]]
+        if key == "distractors":
+            return tuple(
+                self._string(idx) for idx in
+                self._distractors[self._distractor_offsets[pos]:self._distractor_offsets[pos + 1]]
+            )
+        try:
+            column = self.TEXT_FIELDS.index(key)
+        except ValueError:
+            raise KeyError(key) from None
+        text = self._string(self._fields[pos * len(self.TEXT_FIELDS) + column])
+        return text if text or key != "category" else None
+
+    def position(self, word_id: int) -> int | None:
+        idx = bisect.bisect_left(self._sorted_ids, word_id)
+        if idx < len(self._sorted_ids) and self._sorted_ids[idx] == word_id:
+            return self._sorted_pos[idx]
+        return None
+
+    def get(self, word_id: int) -> WordRecord | None:
+        pos = self.position(word_id)
+        return None if pos is None else WordRecord(self, pos)
+
+    def level_range(self, level: str) -> range:
+        idx = LEVEL_ORDER.index(level)
+        return range(self._level_bounds[idx], self._level_bounds[idx + 1])
+
+    def level_view(self, level: str) -> "WordLevelView":
+        return WordLevelView(self, self.level_range(level))
+
+
+class WordLevelView:
+    """Sequence of the records of one level (what random.choice needs)."""
+
+    __slots__ = ("store", "positions")
+
+    def __init__(self, store: WordStore, positions: range):
+        self.store = store
+        self.positions = positions
+
+    def __len__(self) -> int:
+        return len(self.positions)
+
+    def __getitem__(self, idx: int) -> WordRecord:
+        return WordRecord(self.store, self.positions[idx])
+
+
+class WordIndex:
+    """WORDS_BY_ID: deck words from the store plus retired words from the
+    database (plain dicts), looked up with .get(word_id)."""
+
+    __slots__ = ("store", "retired")
+
+    def __init__(self, store: WordStore, retired: dict[int, dict]):
+        self.store = store
+        self.retired = retired
+
+    def get(self, word_id: int, default=None):
+        word = self.store.get(word_id)
+        if word is None:
+            word = self.retired.get(word_id, default)
+        return word
+
+    def __getitem__(self, word_id: int):
+        word = self.get(word_id)
+        if word is None:
+            raise KeyError(word_id)
+        return word
+
+    def __contains__(self, word_id: int) -> bool:
+        return self.get(word_id) is not None
+
+
+def _open_word_store() -> WordStore:
+    """Map the compiled deck for words.json, compiling it first if the
+    store file is missing or stale (runs in a worker thread)."""
+    words_file_path = Path(WORDS_FILE)
+    if not words_file_path.exists():
+        raise FileNotFoundError(
+            f"Words file '{WORDS_FILE}' not found. Please create it with words for each level."
+        )
+    data = words_file_path.read_bytes()
+    # distractors depend on these settings as well as on the file
+    digest = hashlib.blake2b(
+        data + f"|{DISTRACTOR_NEIGHBOURS}|{DISTRACTOR_WINDOW}".encode(), digest_size=16
+    ).digest()
+    store = WordStore.open(WORDS_STORE_PATH, digest)
+    if store is None:
+        words = _read_words(data.decode("utf-8"))
+        WordStore.write(WORDS_STORE_PATH, words, digest)
+        store = WordStore.open(WORDS_STORE_PATH, digest)
+        if store is None:
+            raise RuntimeError(f"Can't map the word store {WORDS_STORE_PATH}")
+    return store
 
 
 # =======================
@@ -182,6 +693,7 @@ def build_quiz_level_keyboard() -> InlineKeyboardMarkup:
             [InlineKeyboardButton(text=" 🟡 중급", callback_data="quiz_lev:중급")],
             [InlineKeyboardButton(text=" 🔴 고급", callback_data="quiz_lev:고급")],
             [InlineKeyboardButton(text=" 🤖 AI Quiz", callback_data="quiz_lev:ai")],
+            [InlineKeyboardButton(text=" 🔁 SRS Quiz", callback_data="quiz_lev:srs")],
         ]
     )
 
@@ -193,6 +705,7 @@ def build_ranking_level_keyboard() -> InlineKeyboardMarkup:
             [InlineKeyboardButton(text=" 🟡 중급 랭킹", callback_data="rank_lev:중급")],
             [InlineKeyboardButton(text=" 🔴 고급 랭킹", callback_data="rank_lev:고급")],
             [InlineKeyboardButton(text=" 🤖 AI Quiz 랭킹", callback_data="rank_lev:ai")],
+            [InlineKeyboardButton(text=" 🔁 SRS Quiz 랭킹", callback_data="rank_lev:srs")],
         ]
     )
 
@@ -201,190 +714,1468 @@ def build_ranking_level_keyboard() -> InlineKeyboardMarkup:
 # =======================
 
 
-async def init_db():
-    async with aiosqlite.connect(DB_PATH) as db:
+class DatabasePool:
+    """Long-lived SQLite connections shared by all DB helpers.
+
+    Writes go through a single connection guarded by a lock (SQLite allows one
+    writer anyway); reads borrow one of several read-only connections, which
+    in WAL mode never wait for the writer.
+    """
+
+    def __init__(self, path: str, readers: int = DB_READERS):
+        self.path = path
+        self.reader_count = max(1, readers)
+        self._writer: aiosqlite.Connection | None = None
+        self._write_lock = asyncio.Lock()
+        self._readers: asyncio.Queue[aiosqlite.Connection] = asyncio.Queue()
+        self._reader_conns: list[aiosqlite.Connection] = []
+
+    async def _connect(self, read_only: bool) -> aiosqlite.Connection:
+        # isolation_level=None: transactions are opened explicitly by
+        # transaction(), plain reads run in autocommit mode
+        db = await aiosqlite.connect(
+            self.path,
+            isolation_level=None,
+            cached_statements=DB_STATEMENT_CACHE,
+        )
+        # executescript steps every statement to completion, so pragmas that
+        # return a row don't leave a statement (and its lock) open
+        await db.executescript(
+            f"""
+            PRAGMA busy_timeout = 5000;
+            PRAGMA synchronous = NORMAL;
+            PRAGMA cache_size = {-DB_CACHE_SIZE_KIB};
+            PRAGMA mmap_size = {DB_MMAP_SIZE};
+            PRAGMA temp_store = MEMORY;
+            PRAGMA query_only = {"ON" if read_only else "OFF"};
+            """
+        )
+        return db
+
+    async def open(self) -> None:
+        try:
+            self._writer = await self._connect(read_only=False)
+            # journal mode is persistent in the file, so set it before readers
+            # connect
+            await self._writer.executescript("PRAGMA journal_mode = WAL;")
+            for _ in range(self.reader_count):
+                conn = await self._connect(read_only=True)
+                self._reader_conns.append(conn)
+                self._readers.put_nowait(conn)
+        except BaseException:
+            await self.close()
+            raise
+        logging.info(
+            f"Database pool opened: {self.path} (1 writer, {self.reader_count} readers)"
+        )
+
+    async def close(self) -> None:
+        for conn in self._reader_conns:
+            await conn.close()
+        self._reader_conns.clear()
+        if self._writer is not None:
+            async with self._write_lock:
+                try:
+                    await self._writer.executescript("PRAGMA optimize;")
+                except Exception:
+                    logging.exception("PRAGMA optimize failed")
+                await self._writer.close()
+            self._writer = None
+
+    @asynccontextmanager
+    async def reader(self):
+        conn = await self._readers.get()
+        try:
+            yield conn
+        finally:
+            self._readers.put_nowait(conn)
+
+    @asynccontextmanager
+    async def transaction(self):
+        """Borrow the writer inside BEGIN IMMEDIATE ... COMMIT (rollback on error)."""
+        async with self._write_lock:
+            db = self._writer
+            await db.execute("BEGIN IMMEDIATE")
+            try:
+                yield db
+            except BaseException:
+                await db.rollback()
+                raise
+            else:
+                await db.commit()
+
+
+# created and opened in main(), closed on shutdown
+db_pool: DatabasePool | None = None
+
+
+def _utc_today() -> str:
+    """Current UTC day, comparable with stored ISO timestamps and day columns."""
+    return datetime.utcnow().date().isoformat()
+
+
+class AnswerLogBuffer:
+    """Write-behind group commit for the append-only answers table.
+
+    Rows are buffered in memory and inserted with one executemany per
+    transaction. add() waits when the buffer is full, flush() writes whatever
+    is pending and is called by readers that need an up-to-date log.
+    """
+
+    def __init__(
+        self,
+        batch_size: int = ANSWER_LOG_BATCH_SIZE,
+        flush_interval_ms: int = ANSWER_LOG_FLUSH_MS,
+        max_pending: int = ANSWER_LOG_MAX_PENDING,
+    ):
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = max(1, flush_interval_ms) / 1000
+        self.max_pending = max(self.batch_size, max_pending)
+        self._pending: list[tuple] = []
+        self._flush_lock = asyncio.Lock()
+        self._wakeup = asyncio.Event()
+        self._has_space = asyncio.Event()
+        self._has_space.set()
+        self._task: asyncio.Task | None = None
+        self._closing = False
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    async def add(
+        self,
+        user_id: int,
+        word_id: int,
+        is_correct: bool,
+        delta_score: int,
+        level: str,
+        quiz_mode: str,
+        created_at: str,
+    ) -> None:
+        while len(self._pending) >= self.max_pending:
+            # backpressure: let the flusher catch up before buffering more
+            self._has_space.clear()
+            self._wakeup.set()
+            await self._has_space.wait()
+        self._pending.append(
+            (user_id, word_id, int(is_correct), delta_score, level, quiz_mode, created_at)
+        )
+        if len(self._pending) >= self.batch_size:
+            self._wakeup.set()
+
+    async def flush(self) -> None:
+        async with self._flush_lock:
+            batch, self._pending = self._pending, []
+            self._has_space.set()
+            if not batch:
+                return
+            try:
+                async with db_pool.transaction() as db:
+                    await db.executemany(
+                        """
+                        INSERT INTO answers (user_id, word_id, is_correct, delta_score, level, quiz_mode, created_at)
+                        VALUES (?, ?, ?, ?, ?, ?, ?)
+                        """,
+                        batch,
+                    )
+                    correct = sum(row[2] for row in batch)
+                    await _bump_counters(db, {
+                        (COUNTERS_GLOBAL, "total_answers"): len(batch),
+                        (COUNTERS_GLOBAL, "correct_answers"): correct,
+                    })
+            except BaseException:
+                # keep the rows (in order) for the next attempt
+                self._pending[:0] = batch
+                if len(self._pending) >= self.max_pending:
+                    self._has_space.clear()
+                raise
+
+    async def _run(self) -> None:
+        while not self._closing:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except Exception:
+                logging.exception("Failed to flush answers log, will retry")
+                await asyncio.sleep(1)
+
+    async def close(self) -> None:
+        """Stop the background flusher and write out everything still buffered."""
+        self._closing = True
+        self._wakeup.set()
+        if self._task is not None:
+            await self._task
+            self._task = None
+        await self.flush()
+
+
+# created in main(), flushed on shutdown
+answer_log: AnswerLogBuffer | None = None
+
+
+class UserPipelines:
+    """Per-user FIFO of background jobs.
+
+    One user's jobs run one at a time in submission order, different users'
+    jobs run concurrently. A user's worker exits as soon as their queue is
+    empty, so idle users hold no task. Failing jobs are logged and skipped.
+    """
+
+    def __init__(self):
+        self._queues: dict[int, deque] = {}
+        self._workers: dict[int, asyncio.Task] = {}
+
+    def __len__(self) -> int:
+        return len(self._queues)
+
+    def submit(self, user_id: int, job: Callable[[], Awaitable[None]]) -> None:
+        queue = self._queues.get(user_id)
+        if queue is None:
+            queue = self._queues[user_id] = deque()
+            self._workers[user_id] = asyncio.create_task(self._run(user_id, queue))
+        queue.append(job)
+
+    async def _run(self, user_id: int, queue: deque) -> None:
+        try:
+            while queue:
+                job = queue.popleft()
+                try:
+                    await job()
+                except Exception:
+                    logging.exception(f"Background job for user {user_id} failed")
+        finally:
+            # no await since the queue was seen empty, so nothing was lost
+            self._queues.pop(user_id, None)
+            self._workers.pop(user_id, None)
+
+    async def close(self) -> None:
+        """Wait until every queued job has run."""
+        while self._workers:
+            await asyncio.gather(*self._workers.values(), return_exceptions=True)
+
+
+# answers are persisted and followed up per user, in tap order
+answer_pipelines = UserPipelines()
+
+
+class UserLocks:
+    """One asyncio.Lock per user for handlers that change the user's state.
+
+    Locks exist only while someone holds or waits for them, so users never
+    contend with each other and idle users cost nothing.
+    """
+
+    def __init__(self):
+        # user_id -> [lock, holders and waiters]
+        self._locks: dict[int, list] = {}
+
+    def __len__(self) -> int:
+        return len(self._locks)
+
+    @asynccontextmanager
+    async def hold(self, user_id: int):
+        entry = self._locks.get(user_id)
+        if entry is None:
+            entry = self._locks[user_id] = [asyncio.Lock(), 0]
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                yield
+        finally:
+            entry[1] -= 1
+            if not entry[1]:
+                del self._locks[user_id]
+
+
+user_locks = UserLocks()
+
+
+class AnsweredQuestions:
+    """Bounded LRU of (chat_id, message_id) of answered question messages."""
+
+    def __init__(self, max_size: int = ANSWERED_CACHE_SIZE):
+        self.max_size = max(1, max_size)
+        self._data: OrderedDict[tuple[int, int], None] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def claim(self, key: tuple[int, int]) -> bool:
+        """Mark the question answered; False if it already was."""
+        if key in self._data:
+            return False
+        self._data[key] = None
+        while len(self._data) > self.max_size:
+            self._data.popitem(last=False)
+        return True
+
+
+answered_questions = AnsweredQuestions()
+
+
+# schema migrations: each step runs in its own transaction and is recorded in
+# schema_version; append new steps to MIGRATIONS, never edit applied ones
+
+
+async def _migration_001_base_schema(db: aiosqlite.Connection) -> None:
+    # databases created before schema_version existed already have some of
+    # these tables/columns, so every step here is idempotent
+    await db.execute(
+        """
+        CREATE TABLE IF NOT EXISTS users (
+            user_id INTEGER PRIMARY KEY,
+            username TEXT,
+            first_name TEXT,
+            total_score INTEGER NOT NULL DEFAULT 0,
+            current_level TEXT NOT NULL,
+            correct_streak INTEGER NOT NULL DEFAULT 0,
+            wrong_streak INTEGER NOT NULL DEFAULT 0,
+            created_at TEXT NOT NULL,
+            updated_at TEXT NOT NULL
+        )
+        """
+    )
+    cur = await db.execute("PRAGMA table_info(users)")
+    columns = [row[1] for row in await cur.fetchall()]
+    await cur.close()
+    if "blocked_at" not in columns:
+        await db.execute("ALTER TABLE users ADD COLUMN blocked_at TEXT")
+    await db.execute(
+        """
+        CREATE TABLE IF NOT EXISTS answers (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            word_id INTEGER NOT NULL,
+            is_correct INTEGER NOT NULL,
+            delta_score INTEGER NOT NULL,
+            level TEXT NOT NULL,
+            quiz_mode TEXT NOT NULL,
+            created_at TEXT NOT NULL,
+            FOREIGN KEY (user_id) REFERENCES users(user_id)
+        )
+        """
+    )
+    cur = await db.execute("PRAGMA table_info(answers)")
+    answer_columns = [row[1] for row in await cur.fetchall()]
+    await cur.close()
+    if "quiz_mode" not in answer_columns:
+        await db.execute("ALTER TABLE answers ADD COLUMN quiz_mode TEXT DEFAULT 'ai'")
+    await db.execute(
+        """
+        CREATE TABLE IF NOT EXISTS user_level_scores (
+            user_id INTEGER NOT NULL,
+            quiz_mode TEXT NOT NULL,
+            total_score INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (user_id, quiz_mode),
+            FOREIGN KEY (user_id) REFERENCES users(user_id)
+        )
+        """
+    )
+
+
+async def _migration_002_hot_path_indexes(db: aiosqlite.Connection) -> None:
+    # today's leaderboard: range over created_at inside one mode, covering
+    # user_id and delta_score so the table itself is never read
+    await db.execute(
+        "CREATE INDEX IF NOT EXISTS idx_answers_mode_created "
+        "ON answers (quiz_mode, created_at, user_id, delta_score)"
+    )
+    # per-user aggregates in exports
+    await db.execute(
+        "CREATE INDEX IF NOT EXISTS idx_answers_user ON answers (user_id)"
+    )
+    # rank lookups: COUNT(*) WHERE quiz_mode = ? AND total_score > ?
+    await db.execute(
+        "CREATE INDEX IF NOT EXISTS idx_level_scores_mode_score "
+        "ON user_level_scores (quiz_mode, total_score)"
+    )
+    await db.execute(
+        "CREATE INDEX IF NOT EXISTS idx_users_created ON users (created_at)"
+    )
+    # give the planner statistics, e.g. for skip-scans over the few quiz modes
+    await db.execute("ANALYZE")
+
+
+async def _migration_003_user_daily_scores(db: aiosqlite.Connection) -> None:
+    # per-day score rollup behind "오늘 TOP 10", kept up to date by
+    # record_answer()
+    await db.execute(
+        """
+        CREATE TABLE IF NOT EXISTS user_daily_scores (
+            day TEXT NOT NULL,
+            quiz_mode TEXT NOT NULL,
+            user_id INTEGER NOT NULL,
+            score INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (day, quiz_mode, user_id)
+        ) WITHOUT ROWID
+        """
+    )
+    await db.execute(
+        "CREATE INDEX IF NOT EXISTS idx_daily_scores_board "
+        "ON user_daily_scores (day, quiz_mode, score DESC, user_id)"
+    )
+    # one-off backfill from the existing answers history
+    await db.execute(
+        """
+        INSERT OR REPLACE INTO user_daily_scores (day, quiz_mode, user_id, score)
+        SELECT substr(created_at, 1, 10), quiz_mode, user_id, SUM(delta_score)
+        FROM answers
+        GROUP BY substr(created_at, 1, 10), quiz_mode, user_id
+        """
+    )
+
+
+async def _rebuild_counters(db: aiosqlite.Connection) -> None:
+    """Recompute bot_counters from the raw tables (inside a transaction)."""
+    await db.execute("DELETE FROM bot_counters")
+    await db.execute(
+        """
+        INSERT INTO bot_counters (day, name, value)
+        SELECT '', 'total_users', COUNT(*) FROM users
+        UNION ALL
+        SELECT '', 'total_score_sum', COALESCE(SUM(total_score), 0) FROM users
+        UNION ALL
+        SELECT '', 'blocked_count', COUNT(*) FROM users
+        WHERE blocked_at IS NOT NULL AND blocked_at != ''
+        UNION ALL
+        SELECT '', 'total_answers', COUNT(*) FROM answers
+        UNION ALL
+        SELECT '', 'correct_answers', COALESCE(SUM(is_correct), 0) FROM answers
+        """
+    )
+    # answers folded away by the retention job (the table appears in a later
+    # migration than this function's first caller)
+    cur = await db.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'answer_user_rollups'"
+    )
+    has_rollups = await cur.fetchone() is not None
+    await cur.close()
+    if has_rollups:
         await db.execute(
             """
-            CREATE TABLE IF NOT EXISTS users (
-                user_id INTEGER PRIMARY KEY,
-                username TEXT,
-                first_name TEXT,
-                total_score INTEGER NOT NULL DEFAULT 0,
-                current_level TEXT NOT NULL,
-                correct_streak INTEGER NOT NULL DEFAULT 0,
-                wrong_streak INTEGER NOT NULL DEFAULT 0,
-                created_at TEXT NOT NULL,
-                updated_at TEXT NOT NULL
+            UPDATE bot_counters SET value = value + (
+                SELECT CASE name
+                    WHEN 'total_answers' THEN COALESCE(SUM(total_answers), 0)
+                    ELSE COALESCE(SUM(correct_answers), 0)
+                END
+                FROM answer_user_rollups
             )
+            WHERE day = '' AND name IN ('total_answers', 'correct_answers')
             """
         )
-        cur = await db.execute("PRAGMA table_info(users)")
-        columns = [row[1] for row in await cur.fetchall()]
-        await cur.close()
-        if "blocked_at" not in columns:
-            await db.execute("ALTER TABLE users ADD COLUMN blocked_at TEXT")
+    await db.execute(
+        """
+        INSERT INTO bot_counters (day, name, value)
+        SELECT '', 'level:' || current_level, COUNT(*)
+        FROM users GROUP BY current_level
+        """
+    )
+    await db.execute(
+        """
+        INSERT INTO bot_counters (day, name, value)
+        SELECT substr(created_at, 1, 10), 'new_users', COUNT(*)
+        FROM users GROUP BY substr(created_at, 1, 10)
+        """
+    )
+    await db.execute(
+        """
+        INSERT INTO bot_counters (day, name, value)
+        SELECT day, 'active_users', COUNT(DISTINCT user_id)
+        FROM user_daily_scores GROUP BY day
+        """
+    )
+
+
+async def _migration_004_bot_counters(db: aiosqlite.Connection) -> None:
+    # last_active_at tells record_answer whether this is the user's first
+    # answer of the day (for the active_users counter)
+    cur = await db.execute("PRAGMA table_info(users)")
+    columns = [row[1] for row in await cur.fetchall()]
+    await cur.close()
+    if "last_active_at" not in columns:
+        await db.execute("ALTER TABLE users ADD COLUMN last_active_at TEXT")
+    await db.execute(
+        """
+        UPDATE users SET last_active_at = (
+            SELECT MAX(a.created_at) FROM answers a WHERE a.user_id = users.user_id
+        )
+        """
+    )
+    await db.execute(
+        """
+        CREATE TABLE IF NOT EXISTS bot_counters (
+            day TEXT NOT NULL,
+            name TEXT NOT NULL,
+            value INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (day, name)
+        ) WITHOUT ROWID
+        """
+    )
+    await _rebuild_counters(db)
+
+
+async def _migration_005_answer_rollups(db: aiosqlite.Connection) -> None:
+    # where archive_old_answers() folds raw answers before deleting them
+    await db.execute(
+        """
+        CREATE TABLE IF NOT EXISTS answer_user_rollups (
+            user_id INTEGER NOT NULL,
+            day TEXT NOT NULL,
+            quiz_mode TEXT NOT NULL,
+            total_answers INTEGER NOT NULL DEFAULT 0,
+            correct_answers INTEGER NOT NULL DEFAULT 0,
+            delta_score INTEGER NOT NULL DEFAULT 0,
+            last_activity TEXT NOT NULL,
+            PRIMARY KEY (user_id, day, quiz_mode)
+        ) WITHOUT ROWID
+        """
+    )
+    await db.execute(
+        """
+        CREATE TABLE IF NOT EXISTS answer_word_rollups (
+            word_id INTEGER NOT NULL,
+            day TEXT NOT NULL,
+            quiz_mode TEXT NOT NULL,
+            total_answers INTEGER NOT NULL DEFAULT 0,
+            correct_answers INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (word_id, day, quiz_mode)
+        ) WITHOUT ROWID
+        """
+    )
+
+
+async def _migration_006_users_created_index(db: aiosqlite.Connection) -> None:
+    # the user export pages through users by (created_at, user_id); name the
+    # tie-breaker explicitly and retire the created_at-only index it replaces
+    await db.execute(
+        "CREATE INDEX IF NOT EXISTS idx_users_created_id "
+        "ON users (created_at, user_id)"
+    )
+    await db.execute("DROP INDEX IF EXISTS idx_users_created")
+
+
+async def _migration_007_broadcast_jobs(db: aiosqlite.Connection) -> None:
+    # content is copied from the admin's chat; last_user_id is the checkpoint
+    # cursor (everyone up to it has been handled)
+    await db.execute(
+        """
+        CREATE TABLE IF NOT EXISTS broadcast_jobs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            admin_id INTEGER NOT NULL,
+            from_chat_id INTEGER NOT NULL,
+            message_id INTEGER NOT NULL,
+            status_message_id INTEGER,
+            status TEXT NOT NULL,
+            last_user_id INTEGER NOT NULL DEFAULT 0,
+            total INTEGER NOT NULL DEFAULT 0,
+            sent INTEGER NOT NULL DEFAULT 0,
+            blocked INTEGER NOT NULL DEFAULT 0,
+            failed INTEGER NOT NULL DEFAULT 0,
+            created_at TEXT NOT NULL,
+            updated_at TEXT NOT NULL,
+            finished_at TEXT
+        )
+        """
+    )
+    await db.execute(
+        "CREATE INDEX IF NOT EXISTS idx_broadcast_jobs_status ON broadcast_jobs(status)"
+    )
+
+
+async def _migration_008_broadcast_segments(db: aiosqlite.Connection) -> None:
+    cur = await db.execute("PRAGMA table_info(broadcast_jobs)")
+    columns = [row[1] for row in await cur.fetchall()]
+    await cur.close()
+    if "segment" not in columns:
+        await db.execute("ALTER TABLE broadcast_jobs ADD COLUMN segment TEXT")
+    # reachable users in id order with the segment columns, so audience counts
+    # and the broadcast cursor never touch blocked rows or the table itself;
+    # the WHERE must match _segment_where() exactly for SQLite to use it
+    await db.execute(
+        """
+        CREATE INDEX IF NOT EXISTS idx_users_reachable
+        ON users (user_id, last_active_at, current_level, total_score)
+        WHERE (blocked_at IS NULL OR blocked_at = '')
+        """
+    )
+    await db.execute(
+        "CREATE INDEX IF NOT EXISTS idx_users_last_active ON users (last_active_at)"
+    )
+
+
+async def _migration_009_stable_word_ids(db: aiosqlite.Connection) -> None:
+    # every id ever served, with its content, so retired ids still resolve
+    await db.execute(
+        """
+        CREATE TABLE IF NOT EXISTS words (
+            word_id INTEGER PRIMARY KEY,
+            level TEXT NOT NULL,
+            korean TEXT NOT NULL,
+            uzbek TEXT NOT NULL,
+            english TEXT NOT NULL,
+            russian TEXT NOT NULL,
+            added_at TEXT NOT NULL,
+            retired_at TEXT
+        )
+        """
+    )
+    # answers used to store the word's position in the deck (LEVEL_ORDER,
+    # then file order, every entry counted); map positions to stable ids
+    # using the deployed file
+    text = await asyncio.to_thread(Path(WORDS_FILE).read_text, encoding="utf-8")
+    entries_by_level = {level: [] for level in LEVEL_ORDER}
+    for level, entry, _ in _iter_word_entries(text):
+        if level in entries_by_level:
+            entries_by_level[level].append(entry)
+    id_map = []
+    position = 0
+    for level in LEVEL_ORDER:
+        for entry in entries_by_level[level]:
+            position += 1
+            if isinstance(entry, dict) and all(
+                    isinstance(entry.get(field), str) for field in WORD_FIELDS):
+                id_map.append((position, _stable_word_id(level, entry)))
+    await db.execute(
+        "CREATE TEMP TABLE word_id_map (old_id INTEGER PRIMARY KEY, new_id INTEGER NOT NULL)"
+    )
+    await db.executemany("INSERT INTO word_id_map (old_id, new_id) VALUES (?, ?)", id_map)
+    for table in ("answers", "answer_word_rollups"):
         await db.execute(
-            """
-            CREATE TABLE IF NOT EXISTS answers (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER NOT NULL,
-                word_id INTEGER NOT NULL,
-                is_correct INTEGER NOT NULL,
-                delta_score INTEGER NOT NULL,
-                level TEXT NOT NULL,
-                quiz_mode TEXT NOT NULL,
-                created_at TEXT NOT NULL,
-                FOREIGN KEY (user_id) REFERENCES users(user_id)
-            )
+            f"""
+            UPDATE {table}
+            SET word_id = (SELECT new_id FROM word_id_map WHERE old_id = {table}.word_id)
+            WHERE word_id IN (SELECT old_id FROM word_id_map)
             """
         )
-        cur = await db.execute("PRAGMA table_info(answers)")
-        answer_columns = [row[1] for row in await cur.fetchall()]
-        await cur.close()
-        if "quiz_mode" not in answer_columns:
-            await db.execute("ALTER TABLE answers ADD COLUMN quiz_mode TEXT DEFAULT 'ai'")
+    await db.execute("DROP TABLE word_id_map")
+
+
+async def _migration_010_user_word_state(db: aiosqlite.Connection) -> None:
+    # SM-2 state of every word a user has answered in SRS mode
+    await db.execute(
+        """
+        CREATE TABLE IF NOT EXISTS user_word_state (
+            user_id INTEGER NOT NULL,
+            word_id INTEGER NOT NULL,
+            repetitions INTEGER NOT NULL DEFAULT 0,
+            ease REAL NOT NULL,
+            interval_days REAL NOT NULL DEFAULT 0,
+            lapses INTEGER NOT NULL DEFAULT 0,
+            due_at TEXT NOT NULL,
+            updated_at TEXT NOT NULL,
+            PRIMARY KEY (user_id, word_id)
+        ) WITHOUT ROWID
+        """
+    )
+    # a user's queue is loaded already ordered by due time
+    await db.execute(
+        "CREATE INDEX IF NOT EXISTS idx_user_word_state_due "
+        "ON user_word_state (user_id, due_at)"
+    )
+
+
+async def _migration_011_user_word_cycles(db: aiosqlite.Connection) -> None:
+    # where each user is in their no-repeat walk through each level
+    await db.execute(
+        """
+        CREATE TABLE IF NOT EXISTS user_word_cycles (
+            user_id INTEGER NOT NULL,
+            level TEXT NOT NULL,
+            seed INTEGER NOT NULL,
+            position INTEGER NOT NULL,
+            size INTEGER NOT NULL,
+            PRIMARY KEY (user_id, level)
+        ) WITHOUT ROWID
+        """
+    )
+
+
+async def _migration_012_answered_questions(db: aiosqlite.Connection) -> None:
+    # every question message that was scored, so a repeated tap never is
+    await db.execute(
+        """
+        CREATE TABLE IF NOT EXISTS answered_questions (
+            chat_id INTEGER NOT NULL,
+            message_id INTEGER NOT NULL,
+            answered_at TEXT NOT NULL,
+            PRIMARY KEY (chat_id, message_id)
+        ) WITHOUT ROWID
+        """
+    )
+    await db.execute(
+        "CREATE INDEX IF NOT EXISTS idx_answered_questions_answered_at "
+        "ON answered_questions (answered_at)"
+    )
+
+
+MIGRATIONS = [
+    (1, "base schema", _migration_001_base_schema),
+    (2, "hot path indexes", _migration_002_hot_path_indexes),
+    (3, "daily score rollup", _migration_003_user_daily_scores),
+    (4, "live counters", _migration_004_bot_counters),
+    (5, "answer rollups", _migration_005_answer_rollups),
+    (6, "users export order", _migration_006_users_created_index),
+    (7, "broadcast jobs", _migration_007_broadcast_jobs),
+    (8, "broadcast segments", _migration_008_broadcast_segments),
+    (9, "stable word ids", _migration_009_stable_word_ids),
+    (10, "spaced repetition state", _migration_010_user_word_state),
+    (11, "word cycles", _migration_011_user_word_cycles),
+    (12, "answered questions", _migration_012_answered_questions),
+]
+
+
+async def init_db():
+    async with db_pool.transaction() as db:
         await db.execute(
             """
-            CREATE TABLE IF NOT EXISTS user_level_scores (
-                user_id INTEGER NOT NULL,
-                quiz_mode TEXT NOT NULL,
-                total_score INTEGER NOT NULL DEFAULT 0,
-                PRIMARY KEY (user_id, quiz_mode),
-                FOREIGN KEY (user_id) REFERENCES users(user_id)
+            CREATE TABLE IF NOT EXISTS schema_version (
+                version INTEGER PRIMARY KEY,
+                description TEXT NOT NULL,
+                applied_at TEXT NOT NULL
             )
             """
         )
-        await db.commit()
+        cur = await db.execute("SELECT COALESCE(MAX(version), 0) FROM schema_version")
+        current_version = (await cur.fetchone())[0]
+        await cur.close()
+
+    for version, description, migrate in MIGRATIONS:
+        if version <= current_version:
+            continue
+        async with db_pool.transaction() as db:
+            await migrate(db)
+            await db.execute(
+                "INSERT INTO schema_version (version, description, applied_at) VALUES (?, ?, ?)",
+                (version, description, datetime.utcnow().isoformat()),
+            )
+        logging.info(f"Applied schema migration {version}: {description}")
+
+
+# bot_counters rows with day = '' are global totals, the others are per UTC day
+COUNTERS_GLOBAL = ""
+
+
+async def _bump_counters(db: aiosqlite.Connection, deltas: dict[tuple[str, str], int]) -> None:
+    """Add deltas to bot_counters; keys are (day, name)."""
+    rows = [(day, name, delta) for (day, name), delta in deltas.items() if delta]
+    if not rows:
+        return
+    await db.executemany(
+        """
+        INSERT INTO bot_counters (day, name, value) VALUES (?, ?, ?)
+        ON CONFLICT(day, name) DO UPDATE SET value = value + excluded.value
+        """,
+        rows,
+    )
+
+
+async def _insert_user_if_missing(
+        db: aiosqlite.Connection,
+        user_id: int,
+        username: str | None,
+        first_name: str | None,
+        now: str) -> bool:
+    # the same user can arrive twice concurrently, the second insert is a
+    # no-op
+    cur = await db.execute(
+        """
+        INSERT OR IGNORE INTO users (
+            user_id, username, first_name, total_score,
+            current_level, correct_streak, wrong_streak,
+            created_at, updated_at
+        ) VALUES (?, ?, ?, 0, ?, 0, 0, ?, ?)
+        """,
+        (user_id, username, first_name, LEVEL_BEGINNER, now, now),
+    )
+    inserted = cur.rowcount == 1
+    await cur.close()
+    if inserted:
+        await _bump_counters(db, {
+            (COUNTERS_GLOBAL, "total_users"): 1,
+            (COUNTERS_GLOBAL, f"level:{LEVEL_BEGINNER}"): 1,
+            (now[:10], "new_users"): 1,
+        })
+    return inserted
+
+
+class UserStateCache:
+    """Bounded LRU of user state rows keyed by user_id.
+
+    Write-through: writers put() the new state right after their transaction
+    commits (or evict() it after a rollback). Readers take version() before
+    loading a row from SQLite and only fill() it in if nobody wrote that
+    user since, so a slow read can never bring back an older state.
+    """
+
+    def __init__(self, max_size: int = USER_CACHE_SIZE):
+        self.max_size = max(1, max_size)
+        self._data: OrderedDict[int, dict] = OrderedDict()
+        # user_id -> version of its last put/evict, for the last max_size
+        # writes; older writes only show up in the _version gap
+        self._writes: OrderedDict[int, int] = OrderedDict()
+        self._version = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, user_id: int) -> dict | None:
+        state = self._data.get(user_id)
+        if state is None:
+            self.misses += 1
+            return None
+        self._data.move_to_end(user_id)
+        self.hits += 1
+        return dict(state)
+
+    def version(self) -> int:
+        return self._version
+
+    def _note_write(self, user_id: int) -> None:
+        self._version += 1
+        self._writes[user_id] = self._version
+        self._writes.move_to_end(user_id)
+        while len(self._writes) > self.max_size:
+            self._writes.popitem(last=False)
+
+    def _store(self, user_id: int, state: dict) -> None:
+        self._data[user_id] = dict(state)
+        self._data.move_to_end(user_id)
+        while len(self._data) > self.max_size:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def put(self, user_id: int, state: dict) -> None:
+        self._note_write(user_id)
+        self._store(user_id, state)
+
+    def fill(self, user_id: int, state: dict, since: int) -> None:
+        """Cache a row read after version() returned since, unless the user
+        was written in the meantime (or too much was written to tell)."""
+        if user_id in self._data:
+            return
+        if self._version - since >= self.max_size or self._writes.get(user_id, 0) > since:
+            return
+        self._store(user_id, state)
+
+    def evict(self, user_id: int) -> None:
+        self._note_write(user_id)
+        self._data.pop(user_id, None)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups * 100, 1) if lookups else 0,
+        }
+
+
+user_cache = UserStateCache()
+
+_USER_STATE_COLUMNS = (
+    "user_id, current_level, total_score, correct_streak, wrong_streak, last_active_at"
+)
+
+
+def _user_state_from_row(row) -> dict:
+    return {
+        "user_id": row[0],
+        "current_level": row[1],
+        "total_score": row[2],
+        "correct_streak": row[3],
+        "wrong_streak": row[4],
+        "last_active_at": row[5],
+    }
 
 
 async def get_or_create_user(
         user_id: int,
         username: str | None,
         first_name: str | None):
+    state = user_cache.get(user_id)
+    if state is not None:
+        return state
+
     now = datetime.utcnow().isoformat()
-    async with aiosqlite.connect(DB_PATH) as db:
+    since = user_cache.version()
+    async with db_pool.reader() as db:
         cur = await db.execute(
-            "SELECT user_id, current_level, total_score, correct_streak, wrong_streak "
-            "FROM users WHERE user_id = ?",
+            f"SELECT {_USER_STATE_COLUMNS} FROM users WHERE user_id = ?",
             (user_id,),
         )
         row = await cur.fetchone()
         await cur.close()
 
-        if row:
-            return {
-                "user_id": row[0],
-                "current_level": row[1],
-                "total_score": row[2],
-                "correct_streak": row[3],
-                "wrong_streak": row[4],
-            }
+    if row:
+        state = _user_state_from_row(row)
+        user_cache.fill(user_id, state, since)
+        return state
 
-        # default to beginner for new users
-        await db.execute(
-            """
-            INSERT INTO users (
-                user_id, username, first_name, total_score,
-                current_level, correct_streak, wrong_streak,
-                created_at, updated_at
-            ) VALUES (?, ?, ?, 0, ?, 0, 0, ?, ?)
-            """,
-            (user_id, username, first_name, LEVEL_BEGINNER, now, now),
+    # default to beginner for new users
+    async with db_pool.transaction() as db:
+        await _insert_user_if_missing(db, user_id, username, first_name, now)
+        cur = await db.execute(
+            f"SELECT {_USER_STATE_COLUMNS} FROM users WHERE user_id = ?",
+            (user_id,),
         )
-        await db.commit()
+        row = await cur.fetchone()
+        await cur.close()
 
-        return {
-            "user_id": user_id,
-            "current_level": LEVEL_BEGINNER,
-            "total_score": 0,
-            "correct_streak": 0,
-            "wrong_streak": 0,
-        }
+    state = _user_state_from_row(row)
+    user_cache.put(user_id, state)
+    return state
 
 
-async def update_user_stats(
-    user_id: int,
-    total_score: int,
-    current_level: str,
-    correct_streak: int,
-    wrong_streak: int,
-):
+async def mark_users_blocked(user_ids: list[int]) -> None:
+    """Mark users as having blocked or deleted the bot (used when sends fail)."""
+    if not user_ids:
+        return
     now = datetime.utcnow().isoformat()
-    async with aiosqlite.connect(DB_PATH) as db:
-        await db.execute(
-            """
-            UPDATE users
-            SET total_score = ?,
-                current_level = ?,
-                correct_streak = ?,
-                wrong_streak = ?,
-                updated_at = ?
-            WHERE user_id = ?
-            """,
-            (total_score, current_level, correct_streak, wrong_streak, now, user_id),
-        )
-        await db.commit()
+    blocked = 0
+    async with db_pool.transaction() as db:
+        for start in range(0, len(user_ids), SQLITE_MAX_PARAMS):
+            chunk = user_ids[start:start + SQLITE_MAX_PARAMS]
+            cur = await db.execute(
+                f"UPDATE users SET blocked_at = ? WHERE user_id IN ({', '.join('?' * len(chunk))}) "
+                "AND (blocked_at IS NULL OR blocked_at = '')",
+                (now, *chunk),
+            )
+            blocked += cur.rowcount
+            await cur.close()
+        await _bump_counters(db, {(COUNTERS_GLOBAL, "blocked_count"): blocked})
 
 
-async def mark_user_blocked(user_id: int) -> None:
-    """Mark user as having blocked or deleted the bot (used when send fails)."""
-    now = datetime.utcnow().isoformat()
-    async with aiosqlite.connect(DB_PATH) as db:
-        await db.execute(
-            "UPDATE users SET blocked_at = ? WHERE user_id = ? AND (blocked_at IS NULL OR blocked_at = '')",
-            (now, user_id),
+async def get_level_score(user_id: int, quiz_mode: str) -> int:
+    async with db_pool.reader() as db:
+        cur = await db.execute(
+            "SELECT total_score FROM user_level_scores WHERE user_id = ? AND quiz_mode = ?",
+            (user_id, quiz_mode),
         )
-        await db.commit()
+        row = await cur.fetchone()
+        await cur.close()
+    return row[0] if row else 0
+
+
+async def _schedule_review(db: aiosqlite.Connection, user_id: int, word_id: int,
+                           is_correct: bool, now: str) -> str:
+    """Advance the user's SRS state of the word; returns its new due_at."""
+    cur = await db.execute(
+        "SELECT repetitions, ease, interval_days, lapses FROM user_word_state "
+        "WHERE user_id = ? AND word_id = ?",
+        (user_id, word_id),
+    )
+    row = await cur.fetchone()
+    await cur.close()
+    repetitions, ease, interval, lapses, due_at = srs_next_review(
+        tuple(row) if row else None, is_correct, datetime.fromisoformat(now))
+    await db.execute(
+        """
+        INSERT INTO user_word_state
+            (user_id, word_id, repetitions, ease, interval_days, lapses, due_at, updated_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT(user_id, word_id) DO UPDATE SET
+            repetitions = excluded.repetitions,
+            ease = excluded.ease,
+            interval_days = excluded.interval_days,
+            lapses = excluded.lapses,
+            due_at = excluded.due_at,
+            updated_at = excluded.updated_at
+        """,
+        (user_id, word_id, repetitions, ease, interval, lapses, due_at, now),
+    )
+    return due_at
 
 
-async def log_answer(
+async def record_answer(
     user_id: int,
+    username: str | None,
+    first_name: str | None,
     word_id: int,
-    is_correct: bool,
-    delta_score: int,
-    level: str,
+    word_level: str,
     quiz_mode: str,
-):
+    is_correct: bool,
+    question: tuple[int, int] | None = None,
+) -> dict | None:
+    """Apply one quiz answer in a single transaction.
+
+    Creates the user if needed and updates streaks/level (AI mode), the
+    word's review schedule (SRS mode) or the level's word cycle (other
+    modes), the per-mode and daily scores and the live counters; the rank
+    comes from the in-memory leaderboard and the answer row itself goes
+    through answer_log.
+    Returns everything the feedback message needs (rank is None when it
+    could not be read), or None when question (chat_id, message_id) was
+    already answered.
+    """
     now = datetime.utcnow().isoformat()
-    async with aiosqlite.connect(DB_PATH) as db:
+    today = now[:10]
+    delta_score = 1 if is_correct else -1
+    try:
+        async with db_pool.transaction() as db:
+            if question is not None:
+                cur = await db.execute(
+                    "INSERT OR IGNORE INTO answered_questions (chat_id, message_id, answered_at) "
+                    "VALUES (?, ?, ?)",
+                    (*question, now),
+                )
+                duplicate = cur.rowcount == 0
+                await cur.close()
+                if duplicate:
+                    return None
+
+            # writers hold the write lock while reading the cache, and every
+            # writer updates it right after commit, so a cached row is current
+            state = user_cache.get(user_id)
+            if state is None:
+                await _insert_user_if_missing(db, user_id, username, first_name, now)
+                cur = await db.execute(
+                    f"SELECT {_USER_STATE_COLUMNS} FROM users WHERE user_id = ?",
+                    (user_id,),
+                )
+                state = _user_state_from_row(await cur.fetchone())
+                await cur.close()
+
+            current_level = state["current_level"]
+            total_score = state["total_score"]
+            correct_streak = state["correct_streak"]
+            wrong_streak = state["wrong_streak"]
+            last_active_at = state["last_active_at"]
+
+            previous_level = current_level
+            previous_total_score = total_score
+            if quiz_mode == QUIZ_MODE_AI:
+                total_score = max(0, total_score + delta_score)
+                if is_correct:
+                    correct_streak += 1
+                    wrong_streak = 0
+                else:
+                    wrong_streak += 1
+                    correct_streak = 0
+                new_level = get_next_level_on_streak(
+                    current_level, correct_streak, wrong_streak)
+                if new_level != current_level:
+                    correct_streak = 0
+                    wrong_streak = 0
+                    current_level = new_level
+                await db.execute(
+                    """
+                    UPDATE users
+                    SET total_score = ?,
+                        current_level = ?,
+                        correct_streak = ?,
+                        wrong_streak = ?,
+                        updated_at = ?,
+                        last_active_at = ?
+                    WHERE user_id = ?
+                    """,
+                    (total_score, current_level, correct_streak, wrong_streak, now, now, user_id),
+                )
+                answer_level = current_level
+            else:
+                await db.execute(
+                    "UPDATE users SET last_active_at = ? WHERE user_id = ?",
+                    (now, user_id),
+                )
+                answer_level = word_level
+
+            level_changed = int(current_level != previous_level)
+            await _bump_counters(db, {
+                (COUNTERS_GLOBAL, "total_score_sum"): total_score - previous_total_score,
+                (COUNTERS_GLOBAL, f"level:{previous_level}"): -level_changed,
+                (COUNTERS_GLOBAL, f"level:{current_level}"): level_changed,
+                (today, "active_users"): int(not last_active_at or last_active_at < today),
+            })
+
+            # atomic read-modify-write: concurrent taps can't lose an update
+            cur = await db.execute(
+                """
+                INSERT INTO user_level_scores (user_id, quiz_mode, total_score)
+                VALUES (?, ?, MAX(0, ?))
+                ON CONFLICT(user_id, quiz_mode)
+                DO UPDATE SET total_score = MAX(0, total_score + ?)
+                RETURNING total_score
+                """,
+                (user_id, quiz_mode, delta_score, delta_score),
+            )
+            level_score = (await cur.fetchone())[0]
+            await cur.close()
+
+            cur = await db.execute(
+                """
+                INSERT INTO user_daily_scores (day, quiz_mode, user_id, score)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT(day, quiz_mode, user_id)
+                DO UPDATE SET score = score + excluded.score
+                RETURNING score
+                """,
+                (today, quiz_mode, user_id, delta_score),
+            )
+            today_score = (await cur.fetchone())[0]
+            await cur.close()
+
+            if quiz_mode == QUIZ_MODE_SRS:
+                review_due_at = await _schedule_review(db, user_id, word_id, is_correct, now)
+            else:
+                cycle = word_cycles.get(user_id, word_level)
+                if cycle is not None:
+                    await db.execute(
+                        """
+                        INSERT INTO user_word_cycles (user_id, level, seed, position, size)
+                        VALUES (?, ?, ?, ?, ?)
+                        ON CONFLICT(user_id, level) DO UPDATE SET
+                            seed = excluded.seed,
+                            position = excluded.position,
+                            size = excluded.size
+                        """,
+                        (user_id, word_level, *cycle),
+                    )
+    except BaseException:
+        # rolled back: drop whatever we may have cached for this user
+        user_cache.evict(user_id)
+        raise
+
+    # no await between commit and here, so the caches and boards below are
+    # updated in commit order
+    user_cache.put(user_id, {
+        "user_id": user_id,
+        "current_level": current_level,
+        "total_score": total_score,
+        "correct_streak": correct_streak,
+        "wrong_streak": wrong_streak,
+        "last_active_at": now,
+    })
+    ranking_cache.note_score_change(quiz_mode, user_id, level_score, today_score)
+    if quiz_mode == QUIZ_MODE_SRS:
+        srs_queues.reschedule(user_id, word_id, word_level, review_due_at)
+    board = LEADERBOARDS.get(quiz_mode)
+    if board is not None:
+        board.set_score(user_id, level_score)
+
+    # committed: from here on nothing may raise, or a retry would find the
+    # question answered and the answer row would be lost
+    await answer_log.add(
+        user_id=user_id,
+        word_id=word_id,
+        is_correct=is_correct,
+        delta_score=delta_score,
+        level=answer_level,
+        quiz_mode=quiz_mode,
+        created_at=now,
+    )
+
+    if board is not None:
+        rank, total_users, _ = board.rank(user_id)
+    else:
+        try:
+            rank, total_users, _ = await _get_user_rank_by_mode_sql(user_id, quiz_mode)
+        except sqlite3.Error:
+            logging.warning(f"Can't rank user {user_id} in {quiz_mode}", exc_info=True)
+            rank, total_users = None, None
+
+    return {
+        "user_id": user_id,
+        "current_level": current_level,
+        "previous_level": previous_level,
+        "level_changed": current_level != previous_level,
+        "total_score": total_score,
+        "correct_streak": correct_streak,
+        "wrong_streak": wrong_streak,
+        "level_score": level_score,
+        "today_score": today_score,
+        "rank": rank,
+        "total_users": total_users,
+    }
+
+
+async def _archive_answers_chunk(archive: aiosqlite.Connection | None,
+                                 cutoff: str, after_id: int) -> int | None:
+    """Fold and remove one chunk of answers older than cutoff.
+
+    Works on the next ANSWERS_RETENTION_CHUNK ids after after_id and returns
+    the last id it looked at, or None when the chunk holds no old rows.
+    """
+    async with db_pool.reader() as db:
+        cur = await db.execute(
+            """
+            SELECT MAX(id), SUM(created_at < ?) FROM (
+                SELECT id, created_at FROM answers WHERE id > ? ORDER BY id LIMIT ?
+            )
+            """,
+            (cutoff, after_id, ANSWERS_RETENTION_CHUNK),
+        )
+        last_id, old_rows = await cur.fetchone()
+        await cur.close()
+        if not old_rows:
+            return None
+        if archive is not None:
+            cur = await db.execute(
+                """
+                SELECT id, user_id, word_id, is_correct, delta_score, level, quiz_mode, created_at
+                FROM answers WHERE id > ? AND id <= ? AND created_at < ?
+                """,
+                (after_id, last_id, cutoff),
+            )
+            rows = await cur.fetchall()
+            await cur.close()
+
+    if archive is not None:
+        # copied before the delete below; ids make a re-run idempotent
+        await archive.executemany(
+            """
+            INSERT OR IGNORE INTO answers
+                (id, user_id, word_id, is_correct, delta_score, level, quiz_mode, created_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            rows,
+        )
+        await archive.commit()
+
+    chunk = (after_id, last_id, cutoff)
+    async with db_pool.transaction() as db:
         await db.execute(
             """
-            INSERT INTO answers (user_id, word_id, is_correct, delta_score, level, quiz_mode, created_at)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
+            INSERT INTO answer_user_rollups
+                (user_id, day, quiz_mode, total_answers, correct_answers, delta_score, last_activity)
+            SELECT user_id, substr(created_at, 1, 10), quiz_mode,
+                   COUNT(*), SUM(is_correct), SUM(delta_score), MAX(created_at)
+            FROM answers
+            WHERE id > ? AND id <= ? AND created_at < ?
+            GROUP BY user_id, substr(created_at, 1, 10), quiz_mode
+            ON CONFLICT(user_id, day, quiz_mode) DO UPDATE SET
+                total_answers = total_answers + excluded.total_answers,
+                correct_answers = correct_answers + excluded.correct_answers,
+                delta_score = delta_score + excluded.delta_score,
+                last_activity = MAX(last_activity, excluded.last_activity)
             """,
-            (user_id, word_id, int(is_correct), delta_score, level, quiz_mode, now),
+            chunk,
         )
-        await db.commit()
+        await db.execute(
+            """
+            INSERT INTO answer_word_rollups
+                (word_id, day, quiz_mode, total_answers, correct_answers)
+            SELECT word_id, substr(created_at, 1, 10), quiz_mode,
+                   COUNT(*), SUM(is_correct)
+            FROM answers
+            WHERE id > ? AND id <= ? AND created_at < ?
+            GROUP BY word_id, substr(created_at, 1, 10), quiz_mode
+            ON CONFLICT(word_id, day, quiz_mode) DO UPDATE SET
+                total_answers = total_answers + excluded.total_answers,
+                correct_answers = correct_answers + excluded.correct_answers
+            """,
+            chunk,
+        )
+        await db.execute(
+            "DELETE FROM answers WHERE id > ? AND id <= ? AND created_at < ?",
+            chunk,
+        )
+    return last_id
+
+
+async def _open_answers_archive(path: str) -> aiosqlite.Connection:
+    archive = await aiosqlite.connect(path)
+    await archive.execute(
+        """
+        CREATE TABLE IF NOT EXISTS answers (
+            id INTEGER PRIMARY KEY,
+            user_id INTEGER NOT NULL,
+            word_id INTEGER NOT NULL,
+            is_correct INTEGER NOT NULL,
+            delta_score INTEGER NOT NULL,
+            level TEXT NOT NULL,
+            quiz_mode TEXT NOT NULL,
+            created_at TEXT NOT NULL
+        )
+        """
+    )
+    await archive.commit()
+    return archive
+
+
+async def archive_old_answers(retention_days: int = ANSWERS_RETENTION_DAYS) -> int:
+    """Apply the answers retention policy; returns how many chunks were processed.
+
+    Raw rows older than retention_days are folded into answer_user_rollups and
+    answer_word_rollups (and copied to ANSWERS_ARCHIVE_PATH if set), then
+    deleted, one short transaction per chunk.
+    """
+    # today's rows back the live boards, never touch them
+    retention_days = max(1, retention_days)
+    cutoff = (datetime.utcnow().date() - timedelta(days=retention_days)).isoformat()
+    archive = await _open_answers_archive(ANSWERS_ARCHIVE_PATH) if ANSWERS_ARCHIVE_PATH else None
+    chunks = 0
+    try:
+        after_id = 0
+        while True:
+            last_id = await _archive_answers_chunk(archive, cutoff, after_id)
+            if last_id is None:
+                break
+            after_id = last_id
+            chunks += 1
+            # let handlers (and their writes) run between chunks
+            await asyncio.sleep(0.05)
+    finally:
+        if archive is not None:
+            await archive.close()
+    if chunks:
+        logging.info(f"Answers retention: folded {chunks} chunk(s) older than {cutoff}")
+    return chunks
+
+
+async def run_answers_retention() -> None:
+    while True:
+        try:
+            await archive_old_answers()
+        except Exception:
+            logging.exception("Answers retention run failed")
+        await asyncio.sleep(ANSWERS_RETENTION_INTERVAL)
+
+
+async def prune_answered_questions(ttl_hours: int = ANSWERED_QUESTIONS_TTL_HOURS) -> int:
+    """Delete answered_questions rows older than the TTL, one short
+    transaction per chunk; returns how many rows went."""
+    cutoff = (datetime.utcnow() - timedelta(hours=max(1, ttl_hours))).isoformat()
+    deleted = 0
+    while True:
+        async with db_pool.transaction() as db:
+            cur = await db.execute(
+                """
+                DELETE FROM answered_questions WHERE (chat_id, message_id) IN (
+                    SELECT chat_id, message_id FROM answered_questions
+                    WHERE answered_at < ? LIMIT ?
+                )
+                """,
+                (cutoff, ANSWERED_QUESTIONS_PRUNE_CHUNK),
+            )
+            count = cur.rowcount
+            await cur.close()
+        deleted += count
+        if count < ANSWERED_QUESTIONS_PRUNE_CHUNK:
+            return deleted
+        # let answer writes in between chunks
+        await asyncio.sleep(0.05)
 
 
-async def get_level_score(user_id: int, quiz_mode: str) -> int:
-    async with aiosqlite.connect(DB_PATH) as db:
+async def run_answered_questions_pruning() -> None:
+    while True:
+        try:
+            await prune_answered_questions()
+        except Exception:
+            logging.exception("Pruning answered questions failed")
+        await asyncio.sleep(3600)
+
+
+async def _sync_words_table(words) -> tuple[dict[int, dict], int, int]:
+    """Record the deck in the words table and retire ids that left it.
+
+    Returns (retired words by id, added count, retired-now count).
+    """
+    now = datetime.utcnow().isoformat()
+    current_ids = {word["id"] for word in words}
+    async with db_pool.transaction() as db:
+        cur = await db.execute("SELECT word_id, retired_at IS NULL FROM words")
+        known = {row[0]: bool(row[1]) for row in await cur.fetchall()}
+        await cur.close()
+        await db.executemany(
+            """
+            INSERT INTO words (word_id, level, korean, uzbek, english, russian, added_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(word_id) DO UPDATE SET level = excluded.level, retired_at = NULL
+            WHERE words.level != excluded.level OR words.retired_at IS NOT NULL
+            """,
+            [
+                (w["id"], w["level"], w["korean"], w["uzbek"], w["english"], w["russian"], now)
+                for w in words
+            ],
+        )
+        gone = [word_id for word_id, active in known.items() if active and word_id not in current_ids]
+        for start in range(0, len(gone), SQLITE_MAX_PARAMS):
+            chunk = gone[start:start + SQLITE_MAX_PARAMS]
+            await db.execute(
+                f"UPDATE words SET retired_at = ? WHERE word_id IN ({', '.join('?' * len(chunk))})",
+                (now, *chunk),
+            )
         cur = await db.execute(
-            "SELECT total_score FROM user_level_scores WHERE user_id = ? AND quiz_mode = ?",
-            (user_id, quiz_mode),
+            "SELECT word_id, level, korean, uzbek, english, russian "
+            "FROM words WHERE retired_at IS NOT NULL"
         )
-        row = await cur.fetchone()
+        retired = {
+            row[0]: {
+                "id": row[0],
+                "level": row[1],
+                "korean": row[2],
+                "uzbek": row[3],
+                "english": row[4],
+                "russian": row[5],
+                "category": None,
+                "distractors": (),
+            }
+            for row in await cur.fetchall()
+        }
         await cur.close()
-    return row[0] if row else 0
+    added = sum(1 for word_id in current_ids if word_id not in known)
+    return retired, added, len(gone)
 
 
-async def update_level_score(
-        user_id: int,
-        quiz_mode: str,
-        delta_score: int) -> int:
-    current = await get_level_score(user_id, quiz_mode)
-    new_score = max(0, current + delta_score)
-    async with aiosqlite.connect(DB_PATH) as db:
-        await db.execute(
-            """
-            INSERT INTO user_level_scores (user_id, quiz_mode, total_score)
-            VALUES (?, ?, ?)
-            ON CONFLICT(user_id, quiz_mode) DO UPDATE SET total_score = excluded.total_score
-            """,
-            (user_id, quiz_mode, new_score),
+_words_reload_lock = asyncio.Lock()
+# (mtime_ns, size) of the words file the current deck was read from
+_words_file_signature = None
+
+
+def _get_words_file_signature():
+    try:
+        stat = Path(WORDS_FILE).stat()
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+async def load_words() -> dict:
+    """(Re)load words.json and swap the new deck in.
+
+    The store is compiled (or just mapped, when another process already
+    compiled this version) in a thread; the globals are replaced in one
+    step, so handlers see either the old or the new deck, never a mix.
+    """
+    global WORDS, WORDS_BY_LEVEL, WORDS_BY_ID, question_renders, _words_file_signature
+    async with _words_reload_lock:
+        signature = _get_words_file_signature()
+        store = await asyncio.to_thread(_open_word_store)
+        retired, added, retired_now = await _sync_words_table(store)
+        WORDS, WORDS_BY_LEVEL, WORDS_BY_ID, question_renders = (
+            store,
+            {level: store.level_view(level) for level in LEVEL_ORDER},
+            WordIndex(store, retired),
+            QuestionRenderCache(),
         )
-        await db.commit()
-    return new_score
+        _words_file_signature = signature
+    return {"total": len(store), "added": added, "retired": retired_now}
+
+
+async def run_words_watch() -> None:
+    """Reload the deck whenever words.json changes on disk."""
+    global _words_file_signature
+    while True:
+        await asyncio.sleep(WORDS_WATCH_INTERVAL)
+        signature = _get_words_file_signature()
+        if signature is None or signature == _words_file_signature:
+            continue
+        try:
+            result = await load_words()
+            logging.info(f"Reloaded {WORDS_FILE}: {result}")
+        except Exception:
+            logging.exception(f"Reloading {WORDS_FILE} failed, keeping the current words")
+            # don't retry the same broken file every interval
+            _words_file_signature = signature
 
 
 # =======================
@@ -392,17 +2183,202 @@ async def update_level_score(
 # =======================
 
 
-def choose_word_for_level(level: str) -> dict:
-    # choosing random word inside level keeps repetition low across sessions
-    return random.choice(WORDS_BY_LEVEL[level])
-
-
-def _pretty_korean_word(raw: str) -> str:
-    # hide technical numeric suffixes like "안녕하세요 2" from the user
-    parts = raw.rsplit(" ", 1)
-    if len(parts) == 2 and parts[1].isdigit():
-        return parts[0]
-    return raw
+def _feistel_round(value: int, key: int) -> int:
+    value = ((value ^ key) * 0xBF58476D1CE4E5B9) & 0xFFFFFFFFFFFFFFFF
+    return value ^ (value >> 31)
+
+
+def permute_index(index: int, size: int, seed: int) -> int:
+    """Image of index under a seeded pseudo-random permutation of range(size).
+
+    A 4-round Feistel network permutes the smallest even-bit-width domain
+    holding size values; results outside range(size) are walked again
+    (cycle-walking), which takes fewer than 4 steps on average.
+    """
+    if size <= 1:
+        return 0
+    half_bits = ((size - 1).bit_length() + 1) // 2
+    mask = (1 << half_bits) - 1
+    keys = [(seed + r * 0x9E3779B97F4A7C15) & 0xFFFFFFFFFFFFFFFF for r in range(4)]
+    value = index
+    while True:
+        left, right = value >> half_bits, value & mask
+        for key in keys:
+            left, right = right, left ^ (_feistel_round(right, key) & mask)
+        value = (left << half_bits) | right
+        if value < size:
+            return value
+
+
+class WordCycles:
+    """No-repeat word order per user and level.
+
+    Each (user, level) walks a seeded permutation of the level, kept as
+    [seed, position, size]: every word comes up once before any repeats,
+    and a finished (or resized, after a deck reload) cycle starts over with
+    a new seed. Cursors are read from user_word_cycles on first use and
+    written back by record_answer(), so a question that was never answered
+    is asked again after a restart.
+    """
+
+    def __init__(self, max_size: int = USER_CACHE_SIZE):
+        self.max_size = max(1, max_size)
+        self._data: OrderedDict[int, dict[str, list]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    async def _load(self, user_id: int) -> dict[str, list]:
+        cursors = self._data.get(user_id)
+        if cursors is not None:
+            self._data.move_to_end(user_id)
+            return cursors
+        async with db_pool.reader() as db:
+            cur = await db.execute(
+                "SELECT level, seed, position, size FROM user_word_cycles WHERE user_id = ?",
+                (user_id,),
+            )
+            rows = await cur.fetchall()
+            await cur.close()
+        # another draw may have filled the cursors while we were reading
+        cursors = self._data.get(user_id)
+        if cursors is None:
+            cursors = self._data[user_id] = {
+                level: [seed, position, size] for level, seed, position, size in rows
+            }
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+        return cursors
+
+    def get(self, user_id: int, level: str) -> tuple[int, int, int] | None:
+        cursors = self._data.get(user_id)
+        if cursors is None or level not in cursors:
+            return None
+        return tuple(cursors[level])
+
+    async def next_word(self, user_id: int, level: str):
+        cursors = await self._load(user_id)
+        pool = WORDS_BY_LEVEL[level]
+        cursor = cursors.get(level)
+        if cursor is None or cursor[1] >= cursor[2] or cursor[2] != len(pool):
+            cursor = cursors[level] = [random.getrandbits(63), 0, len(pool)]
+        seed, position, size = cursor
+        cursor[1] += 1
+        return pool[permute_index(position, size, seed)]
+
+
+word_cycles = WordCycles()
+
+
+def srs_next_review(state: tuple | None, is_correct: bool,
+                    now: datetime) -> tuple[int, float, float, int, str]:
+    """SM-2 step with right/wrong grades (quality 4 and 1).
+
+    state is (repetitions, ease, interval_days, lapses) or None for a word
+    the user meets for the first time; returns the new state plus due_at.
+    """
+    repetitions, ease, interval, lapses = state or (0, SRS_INITIAL_EASE, 0.0, 0)
+    quality = 4 if is_correct else 1
+    ease = max(SRS_MIN_EASE, ease + 0.1 - (5 - quality) * (0.08 + (5 - quality) * 0.02))
+    if is_correct:
+        repetitions += 1
+        if repetitions == 1:
+            interval = 1.0
+        elif repetitions == 2:
+            interval = 6.0
+        else:
+            interval = round(interval * ease, 2)
+        due = now + timedelta(days=interval)
+    else:
+        repetitions = 0
+        interval = 0.0
+        lapses += 1
+        due = now + timedelta(minutes=SRS_RELEARN_MINUTES)
+    return repetitions, ease, interval, lapses, due.isoformat()
+
+
+class SrsQueues:
+    """Due queues of SRS mode: per user, a min-heap of (due_at, word_id) per level.
+
+    A user's rows are read from user_word_state (already in due order, so
+    every per-level list is a valid heap) on first use and kept in a bounded
+    LRU. Rescheduling pushes a new entry; the old one no longer matches
+    the user's due map and is dropped when it surfaces.
+    """
+
+    def __init__(self, max_size: int = SRS_CACHE_SIZE):
+        self.max_size = max(1, max_size)
+        # user_id -> (word_id -> due_at, level -> heap)
+        self._data: OrderedDict[int, tuple[dict[int, str], dict[str, list]]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    async def _load(self, user_id: int) -> tuple[dict[int, str], dict[str, list]]:
+        queue = self._data.get(user_id)
+        if queue is not None:
+            self._data.move_to_end(user_id)
+            return queue
+        # callers hold the user's lock, so none of the user's answers can
+        # commit between this read and the install below
+        async with db_pool.reader() as db:
+            cur = await db.execute(
+                "SELECT word_id, due_at FROM user_word_state "
+                "WHERE user_id = ? ORDER BY due_at",
+                (user_id,),
+            )
+            rows = await cur.fetchall()
+            await cur.close()
+        queue = self._data.get(user_id)
+        if queue is not None:
+            return queue
+        due = {}
+        heaps = {}
+        for word_id, due_at in rows:
+            due[word_id] = due_at
+            word = WORDS.get(word_id)
+            if word is not None:
+                heaps.setdefault(word["level"], []).append((due_at, word_id))
+        queue = self._data[user_id] = (due, heaps)
+        while len(self._data) > self.max_size:
+            self._data.popitem(last=False)
+        return queue
+
+    def reschedule(self, user_id: int, word_id: int, level: str, due_at: str) -> None:
+        queue = self._data.get(user_id)
+        if queue is None:
+            return
+        due, heaps = queue
+        due[word_id] = due_at
+        heapq.heappush(heaps.setdefault(level, []), (due_at, word_id))
+
+    def evict(self, user_id: int) -> None:
+        self._data.pop(user_id, None)
+
+    async def next_word(self, user_id: int, level: str):
+        """The user's most overdue word of the level, else an unseen one."""
+        due, heaps = await self._load(user_id)
+        heap = heaps.get(level, [])
+        while heap:
+            due_at, word_id = heap[0]
+            # superseded entries, and words that left the deck on reload
+            if due.get(word_id) == due_at and WORDS.get(word_id) is not None:
+                break
+            heapq.heappop(heap)
+        if heap and heap[0][0] <= datetime.utcnow().isoformat():
+            return WORDS.get(heap[0][1])
+        pool = WORDS_BY_LEVEL[level]
+        for _ in range(SRS_NEW_WORD_TRIES):
+            word = random.choice(pool)
+            if word["id"] not in due:
+                return word
+        # (almost) every word of the level is scheduled: review ahead
+        if heap:
+            return WORDS.get(heap[0][1])
+        return random.choice(pool)
+
+
+srs_queues = SrsQueues()
 
 
 def build_question_text(word: dict) -> str:
@@ -415,13 +2391,90 @@ def build_question_text(word: dict) -> str:
     return "\n".join(lines)
 
 
-def build_options_keyboard(word: dict, quiz_mode: str) -> InlineKeyboardMarkup:
-    buttons = []
-    for idx, option in enumerate(word["options"]):
-        callback_data = f"ans:{word['id']}:{idx}:{quiz_mode}"
-        buttons.append([InlineKeyboardButton(
-            text=f"{idx+1}) {option}", callback_data=callback_data)])
-    return InlineKeyboardMarkup(inline_keyboard=buttons)
+def _json_str_body(text: str) -> str:
+    # the text as it appears between the quotes of a JSON string
+    return json.dumps(text, ensure_ascii=False)[1:-1]
+
+
+class QuestionRenderCache:
+    """Bounded LRU of the immutable parts of a word's question, keyed by id.
+
+    An entry holds the question text and the answer and distractor labels
+    already escaped for JSON, so a question's keyboard is assembled as a
+    JSON string without building any pydantic models. load_words() swaps in
+    an empty cache together with the new deck.
+    """
+
+    def __init__(self, max_size: int = RENDER_CACHE_SIZE):
+        self.max_size = max(1, max_size)
+        self._data: OrderedDict[int, tuple[str, str, tuple[str, ...]]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, word) -> tuple[str, str, tuple[str, ...]]:
+        word_id = word["id"]
+        entry = self._data.get(word_id)
+        if entry is not None:
+            self._data.move_to_end(word_id)
+            return entry
+        entry = (
+            build_question_text(word),
+            _json_str_body(_pretty_korean_word(word["korean"])),
+            tuple(_json_str_body(text) for text in word["distractors"]),
+        )
+        self._data[word_id] = entry
+        while len(self._data) > self.max_size:
+            self._data.popitem(last=False)
+        return entry
+
+
+question_renders = QuestionRenderCache()
+
+
+# answer buttons carry the correct option's index only inside a MAC keyed
+# from the bot token, so a custom client can neither read nor forge it
+_ANSWER_KEY = hashlib.blake2b(BOT_TOKEN.encode(), digest_size=32, person=b"quiz-answer").digest()
+
+
+def _answer_tag(word_id: int, choice: int, quiz_mode: str,
+                correct_index: int, nonce: str) -> str:
+    message = f"{word_id}:{choice}:{quiz_mode}:{correct_index}:{nonce}".encode()
+    digest = hashlib.blake2b(message, key=_ANSWER_KEY, digest_size=6).digest()
+    return base64.urlsafe_b64encode(digest).decode()
+
+
+def answer_correct_index(word_id: int, choice: int, quiz_mode: str, token: str) -> int | None:
+    """Correct option index signed into an answer button's token, or None
+    if the token is not one render_question() made for this button."""
+    nonce, tag = token[:4], token[4:]
+    for correct_index in range(3):
+        if hmac.compare_digest(_answer_tag(word_id, choice, quiz_mode, correct_index, nonce), tag):
+            return correct_index
+    return None
+
+
+def render_question(word, quiz_mode: str) -> tuple[str, str]:
+    """Question text and its serialized inline keyboard.
+
+    Two distractors are drawn and shuffled on every call; each button's
+    callback is "ans:<word_id>:<choice>:<mode>:<token>", where the token is
+    a per-question nonce plus a tag binding the correct index.
+    """
+    text, answer, distractors = question_renders.get(word)
+    options = [answer, *random.sample(distractors, min(2, len(distractors)))]
+    random.shuffle(options)
+    correct_index = options.index(answer)
+    word_id = word["id"]
+    # a fresh nonce keeps tags from repeating when a word comes up again
+    nonce = base64.urlsafe_b64encode(os.urandom(3)).decode()
+    mode = _json_str_body(quiz_mode)
+    rows = ",".join(
+        f'[{{"text":"{idx + 1}) {option}","callback_data":"ans:{word_id}:{idx}:{mode}:'
+        f'{nonce}{_answer_tag(word_id, idx, quiz_mode, correct_index, nonce)}"}}]'
+        for idx, option in enumerate(options)
+    )
+    return text, f'{{"inline_keyboard":[{rows}]}}'
 
 
 def get_next_level_on_streak(
@@ -444,14 +2497,19 @@ async def send_quiz_question(
         message: Message,
         user_state: dict,
         quiz_mode: str):
-    if quiz_mode == QUIZ_MODE_AI:
-        level = user_state["current_level"]
+    if quiz_mode == QUIZ_MODE_SRS:
+        # reviews follow the user's adaptive level
+        word = await srs_queues.next_word(user_state["user_id"], user_state["current_level"])
     else:
-        level = quiz_mode
-    word = choose_word_for_level(level)
-    text = build_question_text(word)
-    kb = build_options_keyboard(word, quiz_mode)
-    await message.answer(text, reply_markup=kb)
+        if quiz_mode == QUIZ_MODE_AI:
+            level = user_state["current_level"]
+        else:
+            level = quiz_mode
+        word = await word_cycles.next_word(user_state["user_id"], level)
+    text, reply_markup = render_question(word, quiz_mode)
+    # reply_markup is already JSON: skip validation so the session sends it as is
+    await message.bot(SendMessage.model_construct(
+        chat_id=message.chat.id, text=text, reply_markup=reply_markup))
 
 
 # =======================
@@ -459,8 +2517,202 @@ async def send_quiz_question(
 # =======================
 
 
+class ScoreLeaderboard:
+    """Order-statistic index over the scores of one quiz mode.
+
+    A Fenwick tree counts users per score (scores are non-negative integers),
+    so rank and total cost O(log n) and top-K O(K log n). Users sharing a
+    score are kept sorted by user_id, matching the SQL tie-break.
+    """
+
+    def __init__(self, capacity: int = 1024):
+        size = 1
+        while size < capacity:
+            size *= 2
+        self._size = size
+        self._tree = [0] * (size + 1)
+        self._scores: dict[int, int] = {}
+        self._buckets: dict[int, list[int]] = {}
+        self.score_sum = 0
+        # bumped on every set_score(), lets check_leaderboards() spot writes
+        self.updates = 0
+
+    def __len__(self) -> int:
+        return len(self._scores)
+
+    def _add(self, score: int, delta: int) -> None:
+        i = score + 1
+        tree = self._tree
+        while i <= self._size:
+            tree[i] += delta
+            i += i & -i
+
+    def _count_le(self, score: int) -> int:
+        """Number of users with a score <= score."""
+        if score < 0:
+            return 0
+        i = min(score + 1, self._size)
+        tree = self._tree
+        count = 0
+        while i > 0:
+            count += tree[i]
+            i -= i & -i
+        return count
+
+    def _find(self, order: int) -> int:
+        """Smallest score s such that order <= _count_le(s) (order is 1-based)."""
+        pos = 0
+        bit = self._size
+        tree = self._tree
+        while bit:
+            nxt = pos + bit
+            if nxt <= self._size and tree[nxt] < order:
+                pos = nxt
+                order -= tree[nxt]
+            bit >>= 1
+        return pos
+
+    def _grow(self, score: int) -> None:
+        size = self._size
+        while score >= size:
+            size *= 2
+        self._size = size
+        self._tree = [0] * (size + 1)
+        for bucket_score, user_ids in self._buckets.items():
+            self._add(bucket_score, len(user_ids))
+
+    def _remove(self, user_id: int) -> None:
+        old = self._scores.pop(user_id, None)
+        if old is None:
+            return
+        bucket = self._buckets[old]
+        del bucket[bisect.bisect_left(bucket, user_id)]
+        if not bucket:
+            del self._buckets[old]
+        self._add(old, -1)
+        self.score_sum -= old
+
+    def set_score(self, user_id: int, score: int) -> None:
+        self.updates += 1
+        score = max(0, score)
+        if self._scores.get(user_id) == score:
+            return
+        self._remove(user_id)
+        if score >= self._size:
+            self._grow(score)
+        self._scores[user_id] = score
+        bisect.insort(self._buckets.setdefault(score, []), user_id)
+        self._add(score, 1)
+        self.score_sum += score
+
+    def score(self, user_id: int) -> int:
+        return self._scores.get(user_id, 0)
+
+    def rank_of_score(self, score: int) -> int:
+        """Competition rank of a score: 1 + number of users strictly above it."""
+        return len(self._scores) - self._count_le(score) + 1
+
+    def rank(self, user_id: int) -> tuple[int, int, int]:
+        """(rank, total users, score) with the same semantics as the SQL query."""
+        score = self.score(user_id)
+        return self.rank_of_score(score), len(self._scores), score
+
+    def top(self, k: int) -> list[tuple[int, int]]:
+        result: list[tuple[int, int]] = []
+        remaining = min(k, len(self._scores))
+        while remaining > 0:
+            # highest score not yet listed: everything above it is in result
+            score = self._find(len(self._scores) - len(result))
+            for user_id in self._buckets[score][:remaining]:
+                result.append((user_id, score))
+            remaining = min(k, len(self._scores)) - len(result)
+        return result
+
+
+# quiz_mode -> leaderboard; filled by warm_leaderboards() in main(). Until then
+# rank lookups fall back to SQL.
+LEADERBOARDS: dict[str, ScoreLeaderboard] = {}
+
+
+async def warm_leaderboards() -> None:
+    # read through the writer so no score change slips in between the
+    # snapshot and the swap
+    boards = {mode: ScoreLeaderboard() for mode in QUIZ_MODES}
+    async with db_pool.transaction() as db:
+        async with db.execute(
+            "SELECT quiz_mode, user_id, total_score FROM user_level_scores"
+        ) as cur:
+            async for quiz_mode, user_id, total_score in cur:
+                boards.setdefault(quiz_mode, ScoreLeaderboard()).set_score(
+                    user_id, total_score)
+        LEADERBOARDS.clear()
+        LEADERBOARDS.update(boards)
+    logging.info(
+        "Leaderboards warmed: "
+        + ", ".join(f"{mode}={len(board)}" for mode, board in boards.items())
+    )
+
+
+def _leaderboards_version() -> dict:
+    return {mode: (board, board.updates) for mode, board in LEADERBOARDS.items()}
+
+
+async def check_leaderboards() -> bool:
+    """Compare the in-memory boards with user_level_scores, re-warm on drift.
+
+    The scan runs on a reader snapshot; the boards are copied before it, and
+    if any score changed while it ran the result is inconclusive and the
+    check is left to the next run.
+    """
+    version = _leaderboards_version()
+    actual = {
+        mode: (len(board), board.score_sum)
+        for mode, board in LEADERBOARDS.items()
+        if len(board)
+    }
+    async with db_pool.reader() as db:
+        cur = await db.execute(
+            "SELECT quiz_mode, COUNT(*), SUM(total_score) "
+            "FROM user_level_scores GROUP BY quiz_mode"
+        )
+        rows = await cur.fetchall()
+        await cur.close()
+    expected = {mode: (count, total or 0) for mode, count, total in rows}
+    if expected == actual or _leaderboards_version() != version:
+        return True
+    logging.warning(
+        f"Leaderboards out of sync with SQL ({actual} != {expected}), re-warming")
+    await warm_leaderboards()
+    return False
+
+
+async def run_leaderboard_checks() -> None:
+    while True:
+        await asyncio.sleep(LEADERBOARD_CHECK_INTERVAL)
+        try:
+            await check_leaderboards()
+        except Exception:
+            logging.exception("Leaderboard consistency check failed")
+
+
 async def get_all_time_top10_by_mode(quiz_mode: str):
-    async with aiosqlite.connect(DB_PATH) as db:
+    board = LEADERBOARDS.get(quiz_mode)
+    if board is not None:
+        # order from the board, only the names from SQLite
+        top = board.top(10)
+        if not top:
+            return []
+        async with db_pool.reader() as db:
+            cur = await db.execute(
+                "SELECT user_id, COALESCE(username, ''), COALESCE(first_name, '') "
+                f"FROM users WHERE user_id IN ({', '.join('?' * len(top))})",
+                [user_id for user_id, _ in top],
+            )
+            names = {row[0]: row[1:] for row in await cur.fetchall()}
+            await cur.close()
+        return [(user_id, *names.get(user_id, ("", "")), score) for user_id, score in top]
+
+    async with db_pool.reader() as db:
         cur = await db.execute(
             """
             SELECT s.user_id, COALESCE(u.username, ''), COALESCE(u.first_name, ''), s.total_score
@@ -478,21 +2730,21 @@ async def get_all_time_top10_by_mode(quiz_mode: str):
 
 
 async def get_today_top10_by_mode(quiz_mode: str):
-    async with aiosqlite.connect(DB_PATH) as db:
+    today = _utc_today()
+    async with db_pool.reader() as db:
         cur = await db.execute(
             """
-            SELECT a.user_id,
+            SELECT d.user_id,
                    COALESCE(u.username, ''),
                    COALESCE(u.first_name, ''),
-                   SUM(a.delta_score) AS raw_score
-            FROM answers a
-            JOIN users u ON u.user_id = a.user_id
-            WHERE DATE(a.created_at) = DATE('now') AND a.quiz_mode = ?
-            GROUP BY a.user_id
-            ORDER BY raw_score DESC, a.user_id ASC
+                   d.score
+            FROM user_daily_scores d
+            JOIN users u ON u.user_id = d.user_id
+            WHERE d.day = ? AND d.quiz_mode = ?
+            ORDER BY d.score DESC, d.user_id ASC
             LIMIT 10
             """,
-            (quiz_mode,),
+            (today, quiz_mode),
         )
         rows = await cur.fetchall()
         await cur.close()
@@ -504,8 +2756,15 @@ async def get_today_top10_by_mode(quiz_mode: str):
 
 
 async def get_user_rank_by_mode(user_id: int, quiz_mode: str):
+    board = LEADERBOARDS.get(quiz_mode)
+    if board is not None:
+        return board.rank(user_id)
+    return await _get_user_rank_by_mode_sql(user_id, quiz_mode)
+
+
+async def _get_user_rank_by_mode_sql(user_id: int, quiz_mode: str):
     score = await get_level_score(user_id, quiz_mode)
-    async with aiosqlite.connect(DB_PATH) as db:
+    async with db_pool.reader() as db:
         cur = await db.execute(
             """
             SELECT COUNT(*) FROM user_level_scores
@@ -548,7 +2807,11 @@ def _rank_medal_today(idx: int) -> str:
 
 
 def _quiz_mode_label(quiz_mode: str) -> str:
-    return "AI Quiz" if quiz_mode == QUIZ_MODE_AI else quiz_mode
+    if quiz_mode == QUIZ_MODE_AI:
+        return "AI Quiz"
+    if quiz_mode == QUIZ_MODE_SRS:
+        return "SRS Quiz"
+    return quiz_mode
 
 
 def _quiz_mode_emoji_label(quiz_mode: str) -> str:
@@ -558,19 +2821,94 @@ def _quiz_mode_emoji_label(quiz_mode: str) -> str:
         return "🟡중급"
     if quiz_mode == LEVEL_ADVANCED:
         return "🔴고급"
+    if quiz_mode == QUIZ_MODE_SRS:
+        return "🔁SRS Quiz"
     return "🤖AI Quiz"
 
 
-async def format_rating_text_by_mode(user_id: int, quiz_mode: str) -> str:
-    all_time = await get_all_time_top10_by_mode(quiz_mode)
-    today = await get_today_top10_by_mode(quiz_mode)
-    user_rank_info = await get_user_rank_by_mode(user_id, quiz_mode)
+class RankingCache:
+    """Rendered top-10 sections of the ranking page, per board and quiz mode.
+
+    An entry is dropped when a score change could alter its membership or
+    order (the user is listed, or the new score reaches 10th place), when its
+    TTL runs out, or, for today's board, when the UTC day changes. Every
+    score change also bumps the mode's generation, so a section rendered
+    from a read that raced with one is not stored.
+    """
+
+    def __init__(self, ttl: float = RANKING_CACHE_TTL):
+        self.ttl = ttl
+        # (board, quiz_mode) -> (expires_at, day, text, listed user ids,
+        # 10th place score or None if fewer than 10 entries)
+        self._entries: dict[tuple[str, str], tuple] = {}
+        # quiz_mode -> number of score changes seen
+        self._generations: dict[str, int] = {}
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get(self, board: str, quiz_mode: str, day: str | None = None) -> str | None:
+        entry = self._entries.get((board, quiz_mode))
+        if entry is not None:
+            expires_at, entry_day, text, _, _ = entry
+            if expires_at > time.monotonic() and entry_day == day:
+                self.hits += 1
+                return text
+            del self._entries[(board, quiz_mode)]
+        self.misses += 1
+        return None
+
+    def generation(self, quiz_mode: str) -> int:
+        """Take before reading the rows to put()."""
+        return self._generations.get(quiz_mode, 0)
+
+    def put(self, board: str, quiz_mode: str, text: str, rows: list,
+            generation: int, day: str | None = None) -> None:
+        if self._generations.get(quiz_mode, 0) != generation:
+            # a score changed while the rows were read; they may be stale
+            return
+        user_ids = frozenset(row[0] for row in rows)
+        cutoff = rows[9][3] if len(rows) >= 10 else None
+        self._entries[(board, quiz_mode)] = (
+            time.monotonic() + self.ttl, day, text, user_ids, cutoff)
+
+    def _note(self, board: str, quiz_mode: str, user_id: int, score: int) -> None:
+        entry = self._entries.get((board, quiz_mode))
+        if entry is None:
+            return
+        _, _, _, user_ids, cutoff = entry
+        # cutoff <= 0: today's scores are clamped for display, so the real
+        # 10th place may be negative
+        if user_id in user_ids or cutoff is None or cutoff <= 0 or score >= cutoff:
+            del self._entries[(board, quiz_mode)]
+            self.invalidations += 1
+
+    def note_score_change(self, quiz_mode: str, user_id: int,
+                          total_score: int, today_score: int) -> None:
+        self._generations[quiz_mode] = self._generations.get(quiz_mode, 0) + 1
+        self._note("all_time", quiz_mode, user_id, total_score)
+        self._note("today", quiz_mode, user_id, today_score)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+            "hit_rate": round(self.hits / lookups * 100, 1) if lookups else 0,
+        }
 
-    label = _quiz_mode_label(quiz_mode)
-    lines: list[str] = []
-    lines.append(f"🏆 랭킹 — {label}")
-    lines.append("")
-    lines.append("🔹 전체 TOP 10")
+
+ranking_cache = RankingCache()
+
+
+async def _render_all_time_section(quiz_mode: str) -> str:
+    text = ranking_cache.get("all_time", quiz_mode)
+    if text is not None:
+        return text
+    generation = ranking_cache.generation(quiz_mode)
+    all_time = await get_all_time_top10_by_mode(quiz_mode)
+    lines = ["🔹 전체 TOP 10"]
     if not all_time:
         lines.append("  (아직 사용자가 없습니다)")
     else:
@@ -579,8 +2917,19 @@ async def format_rating_text_by_mode(user_id: int, quiz_mode: str) -> str:
             name = username or first_name or str(uid)
             medal = _rank_medal_all_time(idx)
             lines.append(f"{medal}{idx}. {name} — {score}💎")
-    lines.append("")
-    lines.append("🔸 오늘 TOP 10")
+    text = "\n".join(lines)
+    ranking_cache.put("all_time", quiz_mode, text, all_time, generation)
+    return text
+
+
+async def _render_today_section(quiz_mode: str) -> str:
+    today_day = _utc_today()
+    text = ranking_cache.get("today", quiz_mode, day=today_day)
+    if text is not None:
+        return text
+    generation = ranking_cache.generation(quiz_mode)
+    today = await get_today_top10_by_mode(quiz_mode)
+    lines = ["🔸 오늘 TOP 10"]
     if not today:
         lines.append("  (오늘 활동한 사용자가 없습니다)")
     else:
@@ -589,6 +2938,23 @@ async def format_rating_text_by_mode(user_id: int, quiz_mode: str) -> str:
             name = username or first_name or str(uid)
             medal = _rank_medal_today(idx)
             lines.append(f"{medal}{idx}. {name} — {score}💎")
+    text = "\n".join(lines)
+    ranking_cache.put("today", quiz_mode, text, today, generation, day=today_day)
+    return text
+
+
+async def format_rating_text_by_mode(user_id: int, quiz_mode: str) -> str:
+    all_time_section = await _render_all_time_section(quiz_mode)
+    today_section = await _render_today_section(quiz_mode)
+    user_rank_info = await get_user_rank_by_mode(user_id, quiz_mode)
+
+    label = _quiz_mode_label(quiz_mode)
+    lines: list[str] = []
+    lines.append(f"🏆 랭킹 — {label}")
+    lines.append("")
+    lines.append(all_time_section)
+    lines.append("")
+    lines.append(today_section)
     lines.append("")
     rank, total_users, total_score = user_rank_info
     if total_users == 0:
@@ -609,89 +2975,64 @@ def is_admin(username: str | None) -> bool:
 
 
 async def get_bot_statistics():
-    async with aiosqlite.connect(DB_PATH) as db:
-        # total users
-        cur = await db.execute("SELECT COUNT(*) FROM users")
-        total_users = (await cur.fetchone())[0]
-        await cur.close()
-
-        # active users today
-        cur = await db.execute(
-            """
-            SELECT COUNT(DISTINCT user_id)
-            FROM answers
-            WHERE DATE(created_at) = DATE('now')
-            """
-        )
-        active_today = (await cur.fetchone())[0]
-        await cur.close()
-
-        # total answers
-        cur = await db.execute("SELECT COUNT(*) FROM answers")
-        total_answers = (await cur.fetchone())[0]
-        await cur.close()
-
-        # correct answers percentage
-        cur = await db.execute(
-            "SELECT COUNT(*) FROM answers WHERE is_correct = 1"
-        )
-        correct_answers = (await cur.fetchone())[0]
-        await cur.close()
-        correct_percentage = (
-            round((correct_answers / total_answers * 100), 2)
-            if total_answers > 0
-            else 0
-        )
-
-        # users by level
+    # answer totals are counted when the write-behind log is flushed
+    await answer_log.flush()
+    today = _utc_today()
+    async with db_pool.reader() as db:
         cur = await db.execute(
-            """
-            SELECT current_level, COUNT(*) as count
-            FROM users
-            GROUP BY current_level
-            """
+            "SELECT day, name, value FROM bot_counters WHERE day IN (?, ?)",
+            (COUNTERS_GLOBAL, today),
         )
-        level_stats = await cur.fetchall()
+        rows = await cur.fetchall()
         await cur.close()
 
-        # new users today
-        cur = await db.execute(
-            """
-            SELECT COUNT(*)
-            FROM users
-            WHERE DATE(created_at) = DATE('now')
-            """
-        )
-        new_users_today = (await cur.fetchone())[0]
-        await cur.close()
+    counters = {(day, name): value for day, name, value in rows}
 
-        # total score sum
-        cur = await db.execute("SELECT SUM(total_score) FROM users")
-        total_score_sum = (await cur.fetchone())[0] or 0
-        await cur.close()
+    def total(name: str) -> int:
+        return counters.get((COUNTERS_GLOBAL, name), 0)
 
-        # users who blocked or deleted the bot (discovered e.g. when broadcast
-        # fails)
-        cur = await db.execute(
-            "SELECT COUNT(*) FROM users WHERE blocked_at IS NOT NULL AND blocked_at != ''"
-        )
-        blocked_count = (await cur.fetchone())[0]
-        await cur.close()
+    total_users = total("total_users")
+    total_answers = total("total_answers")
+    correct_answers = total("correct_answers")
+    blocked_count = total("blocked_count")
+    correct_percentage = (
+        round((correct_answers / total_answers * 100), 2)
+        if total_answers > 0
+        else 0
+    )
+    level_stats = sorted(
+        (
+            (name.split(":", 1)[1], value)
+            for (day, name), value in counters.items()
+            if day == COUNTERS_GLOBAL and name.startswith("level:") and value
+        ),
+        key=lambda item: (
+            LEVEL_ORDER.index(item[0]) if item[0] in LEVEL_ORDER else len(LEVEL_ORDER),
+            item[0],
+        ),
+    )
 
     return {
         "total_users": total_users,
-        "active_today": active_today,
-        "new_users_today": new_users_today,
+        "active_today": counters.get((today, "active_users"), 0),
+        "new_users_today": counters.get((today, "new_users"), 0),
         "total_answers": total_answers,
         "correct_answers": correct_answers,
         "correct_percentage": correct_percentage,
         "level_stats": level_stats,
-        "total_score_sum": total_score_sum,
+        "total_score_sum": total("total_score_sum"),
         "blocked_count": blocked_count,
         "active_available": total_users - blocked_count,
     }
 
 
+async def rebuild_counters() -> None:
+    """Recompute the live statistics counters from the raw tables."""
+    await answer_log.flush()
+    async with db_pool.transaction() as db:
+        await _rebuild_counters(db)
+
+
 async def format_statistics_text() -> str:
     stats = await get_bot_statistics()
     lines: list[str] = []
@@ -720,81 +3061,946 @@ async def format_statistics_text() -> str:
         lines.append(f"  • {level_name}: {count}명")
     lines.append("")
     lines.append(f"🏆 총 점수 합계: {stats['total_score_sum']}점")
+    cache_stats = ranking_cache.stats()
+    lines.append(
+        f"🗂 랭킹 캐시: hit {cache_stats['hits']} / miss {cache_stats['misses']} "
+        f"({cache_stats['hit_rate']}%), 무효화 {cache_stats['invalidations']}회"
+    )
+    user_stats = user_cache.stats()
+    lines.append(
+        f"👤 사용자 캐시: {user_stats['size']}/{user_stats['max_size']}, "
+        f"hit {user_stats['hits']} / miss {user_stats['misses']} "
+        f"({user_stats['hit_rate']}%), 제거 {user_stats['evictions']}회"
+    )
 
     return "\n".join(lines)
 
 
-async def get_all_user_ids():
-    async with aiosqlite.connect(DB_PATH) as db:
-        cur = await db.execute("SELECT user_id FROM users")
+class TokenBucket:
+    """Rate limiter shared by concurrent senders.
+
+    Tokens refill at `rate` per second up to `capacity`. A flood error
+    (429 with retry_after) stops every sender for that long and halves the
+    rate, which then grows back by 1% of the configured rate per success.
+    """
+
+    def __init__(self, rate: float, capacity: float | None = None):
+        self.max_rate = max(0.1, rate)
+        self.rate = self.max_rate
+        self.capacity = capacity or max(1.0, self.max_rate / 10)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        # senders queue on the lock, so tokens are handed out in FIFO order
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    await asyncio.sleep(self._paused_until - now)
+                    continue
+                self._tokens = min(
+                    self.capacity, self._tokens + (now - self._updated) * self.rate
+                )
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+    def on_success(self) -> None:
+        if self.rate < self.max_rate:
+            self.rate = min(self.max_rate, self.rate + self.max_rate / 100)
+
+    def on_flood(self, retry_after: float) -> None:
+        self._paused_until = max(self._paused_until, time.monotonic() + retry_after)
+        self._tokens = 0
+        self.rate = max(self.max_rate / 16, self.rate / 2)
+
+
+def _broadcast_source_gone(error: TelegramBadRequest) -> bool:
+    """The message being copied was deleted from the admin chat."""
+    return "message to copy not found" in str(error).lower()
+
+
+async def _broadcast_send_one(send, user_id: int, bucket: TokenBucket) -> str:
+    """Deliver one message with retries; returns "sent", "blocked" or "failed".
+
+    Raises TelegramBadRequest when the source message is gone.
+    """
+    for attempt in range(BROADCAST_MAX_RETRIES):
+        await bucket.acquire()
+        try:
+            await send(user_id)
+        except TelegramRetryAfter as e:
+            logging.warning(f"Flood control, pausing broadcast for {e.retry_after}s")
+            bucket.on_flood(e.retry_after)
+        except TelegramForbiddenError:
+            # blocked by the user or the account is deactivated
+            return "blocked"
+        except TelegramBadRequest as e:
+            if "chat not found" in str(e).lower():
+                return "blocked"
+            if _broadcast_source_gone(e):
+                # nobody else can get it either: stop the whole broadcast
+                raise
+            logging.warning(f"Failed to send message to {user_id}: {e}")
+            return "failed"
+        except (TelegramNetworkError, TelegramServerError) as e:
+            logging.warning(f"Send to {user_id} failed (attempt {attempt + 1}): {e}")
+            await asyncio.sleep(min(2 ** attempt, 30))
+        except Exception as e:
+            logging.warning(f"Failed to send message to {user_id}: {e}")
+            return "failed"
+        else:
+            bucket.on_success()
+            return "sent"
+    logging.warning(f"Failed to send message to {user_id}: retries exhausted")
+    return "failed"
+
+
+async def deliver_broadcast(
+        user_ids,
+        send,
+        stats: dict,
+        bucket: TokenBucket | None = None,
+        workers: int = BROADCAST_WORKERS) -> None:
+    """Send to every id of the async iterable user_ids.
+
+    send(user_id) makes the API call; `workers` senders run concurrently,
+    paced by the shared bucket. stats["sent"/"blocked"/"failed"] are updated
+    as results come in and blocked chats are marked in batches. An error
+    from a sender (a deleted source message) stops the delivery.
+    """
+    bucket = bucket or TokenBucket(BROADCAST_RATE)
+    queue: asyncio.Queue = asyncio.Queue(maxsize=workers * 2)
+    blocked: list[int] = []
+
+    async def flush_blocked() -> None:
+        ids = blocked[:]
+        blocked.clear()
+        try:
+            await mark_users_blocked(ids)
+        except Exception:
+            logging.exception("Failed to mark blocked users")
+
+    async def worker() -> None:
+        while True:
+            user_id = await queue.get()
+            if user_id is None:
+                return
+            outcome = await _broadcast_send_one(send, user_id, bucket)
+            stats[outcome] += 1
+            if outcome == "blocked":
+                blocked.append(user_id)
+                if len(blocked) >= BROADCAST_BLOCKED_BATCH:
+                    await flush_blocked()
+
+    async def produce() -> None:
+        async for user_id in user_ids:
+            await queue.put(user_id)
+        for _ in tasks:
+            await queue.put(None)
+
+    tasks = [asyncio.create_task(worker()) for _ in range(max(1, workers))]
+    producer = asyncio.create_task(produce())
+    try:
+        # a failing worker would leave the producer stuck on a full queue
+        done, _ = await asyncio.wait(
+            [producer, *tasks], return_when=asyncio.FIRST_EXCEPTION)
+        for task in done:
+            task.result()
+    finally:
+        producer.cancel()
+        for task in tasks:
+            task.cancel()
+        await flush_blocked()
+
+
+BROADCAST_STATUS_LABELS = {
+    "running": "▶️ 진행 중",
+    "paused": "⏸ 일시정지",
+    "cancelled": "⛔ 취소됨",
+    "done": "✅ 완료",
+}
+BROADCAST_JOB_COLUMNS = [
+    "id", "admin_id", "from_chat_id", "message_id", "status_message_id",
+    "status", "last_user_id", "total", "sent", "blocked", "failed",
+    "created_at", "updated_at", "finished_at", "segment",
+]
+
+# values the admin can cycle through for each audience filter (None = any)
+BROADCAST_SEGMENT_OPTIONS = {
+    "active_days": [None, 1, 7, 30],
+    "level": [None, *LEVEL_ORDER],
+    "quiz_mode": [None, *QUIZ_MODES],
+    "min_score": [None, 10, 100, 1000],
+}
+
+# one rate budget for all broadcast jobs
+broadcast_bucket = TokenBucket(BROADCAST_RATE)
+# job id -> task currently sending it
+broadcast_tasks: dict[int, asyncio.Task] = {}
+
+
+def _segment_where(segment: dict | None) -> tuple[str, list]:
+    """SQL condition (on users u) and params for a broadcast audience.
+
+    Users who blocked the bot are always excluded.
+    """
+    segment = segment or {}
+    conditions = ["(blocked_at IS NULL OR blocked_at = '')"]
+    params: list = []
+    if segment.get("active_days"):
+        since = (datetime.utcnow() - timedelta(days=segment["active_days"])).date()
+        conditions.append("u.last_active_at >= ?")
+        params.append(since.isoformat())
+    if segment.get("level"):
+        conditions.append("u.current_level = ?")
+        params.append(segment["level"])
+    # min_score is the score in the selected mode, otherwise the AI Quiz score
+    if segment.get("quiz_mode"):
+        conditions.append(
+            "EXISTS (SELECT 1 FROM user_level_scores s "
+            "WHERE s.user_id = u.user_id AND s.quiz_mode = ? AND s.total_score >= ?)"
+        )
+        params.extend([segment["quiz_mode"], segment.get("min_score") or 0])
+    elif segment.get("min_score"):
+        conditions.append("u.total_score >= ?")
+        params.append(segment["min_score"])
+    return " AND ".join(conditions), params
+
+
+def describe_segment(segment: dict | None) -> str:
+    segment = segment or {}
+    parts = []
+    if segment.get("active_days"):
+        parts.append(f"최근 {segment['active_days']}일 활동")
+    if segment.get("level"):
+        parts.append(f"레벨 {segment['level']}")
+    if segment.get("quiz_mode"):
+        parts.append(f"{_quiz_mode_label(segment['quiz_mode'])} 참여")
+    if segment.get("min_score"):
+        parts.append(f"점수 {segment['min_score']}+")
+    return ", ".join(parts) if parts else "전체 (차단 제외)"
+
+
+async def count_segment(segment: dict | None) -> int:
+    where, params = _segment_where(segment)
+    async with db_pool.reader() as db:
+        cur = await db.execute(f"SELECT COUNT(*) FROM users u WHERE {where}", params)
+        count = (await cur.fetchone())[0]
+        await cur.close()
+    return count
+
+
+async def create_broadcast_job(admin_id: int, from_chat_id: int, message_id: int,
+                               status_message_id: int | None = None,
+                               segment: dict | None = None) -> int:
+    now = datetime.utcnow().isoformat()
+    total = await count_segment(segment)
+    async with db_pool.transaction() as db:
+        cur = await db.execute(
+            """
+            INSERT INTO broadcast_jobs (
+                admin_id, from_chat_id, message_id, status_message_id,
+                status, total, segment, created_at, updated_at
+            ) VALUES (?, ?, ?, ?, 'running', ?, ?, ?, ?)
+            """,
+            (admin_id, from_chat_id, message_id, status_message_id, total,
+             json.dumps(segment or {}), now, now),
+        )
+        job_id = cur.lastrowid
+        await cur.close()
+    return job_id
+
+
+async def get_broadcast_job(job_id: int) -> dict | None:
+    async with db_pool.reader() as db:
+        cur = await db.execute(
+            f"SELECT {', '.join(BROADCAST_JOB_COLUMNS)} FROM broadcast_jobs WHERE id = ?",
+            (job_id,),
+        )
+        row = await cur.fetchone()
+        await cur.close()
+    return dict(zip(BROADCAST_JOB_COLUMNS, row)) if row else None
+
+
+async def get_recent_broadcast_jobs(limit: int = 10) -> list[dict]:
+    async with db_pool.reader() as db:
+        cur = await db.execute(
+            f"SELECT {', '.join(BROADCAST_JOB_COLUMNS)} FROM broadcast_jobs "
+            "ORDER BY id DESC LIMIT ?",
+            (limit,),
+        )
         rows = await cur.fetchall()
         await cur.close()
-    return [row[0] for row in rows]
+    return [dict(zip(BROADCAST_JOB_COLUMNS, row)) for row in rows]
 
 
-async def get_all_users_detailed():
-    """Fetch all users with aggregated stats from answers (total_answers, correct_answers, last_activity)."""
-    async with aiosqlite.connect(DB_PATH) as db:
+async def set_broadcast_job_status(job_id: int, status: str) -> bool:
+    """Change the status of an unfinished job; False if it already finished."""
+    now = datetime.utcnow().isoformat()
+    finished_at = now if status in ("cancelled", "done") else None
+    async with db_pool.transaction() as db:
         cur = await db.execute(
             """
-            SELECT
-                u.user_id,
-                u.username,
-                u.first_name,
-                u.total_score,
-                u.current_level,
-                u.correct_streak,
-                u.wrong_streak,
-                u.created_at,
-                u.updated_at,
-                COALESCE(agg.total_answers, 0) AS total_answers,
-                COALESCE(agg.correct_answers, 0) AS correct_answers,
-                agg.last_activity
-            FROM users u
-            LEFT JOIN (
-                SELECT
-                    user_id,
-                    COUNT(*) AS total_answers,
-                    SUM(is_correct) AS correct_answers,
-                    MAX(created_at) AS last_activity
-                FROM answers
-                GROUP BY user_id
-            ) agg ON u.user_id = agg.user_id
-            ORDER BY u.created_at ASC
+            UPDATE broadcast_jobs SET status = ?, updated_at = ?, finished_at = ?
+            WHERE id = ? AND status IN ('running', 'paused')
+            """,
+            (status, now, finished_at, job_id),
+        )
+        changed = cur.rowcount > 0
+        await cur.close()
+    return changed
+
+
+async def _checkpoint_broadcast_job(job_id: int, last_user_id: int, stats: dict) -> None:
+    async with db_pool.transaction() as db:
+        await db.execute(
             """
+            UPDATE broadcast_jobs
+            SET last_user_id = ?, sent = ?, blocked = ?, failed = ?, updated_at = ?
+            WHERE id = ?
+            """,
+            (last_user_id, stats["sent"], stats["blocked"], stats["failed"],
+             datetime.utcnow().isoformat(), job_id),
+        )
+
+
+async def _broadcast_user_batch(after_user_id: int, limit: int,
+                                segment: dict | None = None) -> list[int]:
+    where, params = _segment_where(segment)
+    async with db_pool.reader() as db:
+        cur = await db.execute(
+            f"SELECT u.user_id FROM users u WHERE u.user_id > ? AND {where} "
+            "ORDER BY u.user_id LIMIT ?",
+            (after_user_id, *params, limit),
         )
         rows = await cur.fetchall()
         await cur.close()
+    return [row[0] for row in rows]
 
-    columns = [
-        "user_id", "username", "first_name", "total_score", "current_level",
-        "correct_streak", "wrong_streak", "created_at", "updated_at",
-        "total_answers", "correct_answers", "last_activity",
-    ]
-    return [dict(zip(columns, row)) for row in rows]
+
+def format_broadcast_job(job: dict) -> str:
+    total = job["total"]
+    processed = job["sent"] + job["blocked"] + job["failed"]
+    percent = round(min(processed / total, 1) * 100, 1) if total else 100
+    return (
+        f"📢 방송 #{job['id']} — {BROADCAST_STATUS_LABELS.get(job['status'], job['status'])}\n\n"
+        f"대상: {describe_segment(json.loads(job['segment'] or '{}'))}\n"
+        f"전체: {total}명\n"
+        f"성공: {job['sent']}명\n"
+        f"실패: {job['blocked'] + job['failed']}명 (차단: {job['blocked']}명)\n"
+        f"진행률: {processed}/{total} ({percent}%)"
+    )
 
 
-def _export_users_csv(rows: list[dict], filepath: Path) -> None:
-    if not rows:
+async def show_broadcast_job(bot: Bot, job_id: int) -> None:
+    """Refresh the job's status message in the admin chat."""
+    job = await get_broadcast_job(job_id)
+    if not job or not job["status_message_id"]:
         return
-    with open(filepath, "w", newline="", encoding="utf-8-sig") as f:
-        writer = csv.DictWriter(f, fieldnames=rows[0].keys())
-        writer.writeheader()
-        writer.writerows(rows)
+    try:
+        await bot.edit_message_text(
+            format_broadcast_job(job),
+            chat_id=job["admin_id"],
+            message_id=job["status_message_id"],
+            reply_markup=build_broadcast_job_keyboard(job),
+        )
+    except TelegramBadRequest:
+        # "message is not modified" or the message is gone
+        pass
 
 
-def _export_users_excel(rows: list[dict], filepath: Path) -> None:
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Users"
-    if not rows:
-        wb.save(filepath)
+def start_broadcast_job(bot: Bot, job_id: int) -> None:
+    task = broadcast_tasks.get(job_id)
+    if task is None or task.done():
+        broadcast_tasks[job_id] = _spawn_background(run_broadcast_job(bot, job_id))
+
+
+async def run_broadcast_job(bot: Bot, job_id: int) -> None:
+    """Send a broadcast job batch by batch from its saved cursor.
+
+    The status is re-read before every batch, so pause/cancel take effect
+    after the current batch; the cursor and counters are checkpointed after
+    each one.
+    """
+    job = await get_broadcast_job(job_id)
+    if not job:
+        broadcast_tasks.pop(job_id, None)
         return
-    headers = list(rows[0].keys())
-    ws.append(headers)
-    for r in rows:
-        ws.append([r.get(h, "") for h in headers])
-    wb.save(filepath)
+    from_chat_id, message_id = job["from_chat_id"], job["message_id"]
+    segment = json.loads(job["segment"] or "{}")
+
+    async def send(user_id: int) -> None:
+        await bot.copy_message(
+            chat_id=user_id, from_chat_id=from_chat_id, message_id=message_id
+        )
+
+    async def batch_ids(user_ids: list[int]):
+        for user_id in user_ids:
+            yield user_id
+
+    stats = {"sent": job["sent"], "blocked": job["blocked"], "failed": job["failed"]}
+    cursor = job["last_user_id"]
+    try:
+        while job["status"] == "running":
+            user_ids = await _broadcast_user_batch(
+                cursor, BROADCAST_CHECKPOINT_BATCH, segment
+            )
+            if not user_ids:
+                await set_broadcast_job_status(job_id, "done")
+                break
+            await deliver_broadcast(batch_ids(user_ids), send, stats, broadcast_bucket)
+            cursor = user_ids[-1]
+            await _checkpoint_broadcast_job(job_id, cursor, stats)
+            await show_broadcast_job(bot, job_id)
+            job = await get_broadcast_job(job_id)
+    except asyncio.CancelledError:
+        # shutdown: the job stays "running" and is resumed on the next start
+        raise
+    except TelegramBadRequest as e:
+        if not _broadcast_source_gone(e):
+            logging.exception(f"Broadcast job {job_id} failed, pausing it")
+        else:
+            logging.error(f"Broadcast job {job_id}: source message was deleted, pausing it")
+            try:
+                await bot.send_message(
+                    job["admin_id"],
+                    f"⚠️ 방송 #{job_id}의 원본 메시지가 삭제되어 일시정지했습니다.",
+                )
+            except Exception:
+                logging.warning(f"Can't notify the admin of broadcast job {job_id}", exc_info=True)
+        await set_broadcast_job_status(job_id, "paused")
+    except Exception:
+        logging.exception(f"Broadcast job {job_id} failed, pausing it")
+        await set_broadcast_job_status(job_id, "paused")
+
+    broadcast_tasks.pop(job_id, None)
+    # a resume may have landed between the last status read and the pop above
+    job = await get_broadcast_job(job_id)
+    if job["status"] == "running":
+        start_broadcast_job(bot, job_id)
+    else:
+        await show_broadcast_job(bot, job_id)
+
+
+async def resume_broadcast_jobs(bot: Bot) -> None:
+    """Restart jobs that were running when the process stopped."""
+    async with db_pool.reader() as db:
+        cur = await db.execute("SELECT id FROM broadcast_jobs WHERE status = 'running'")
+        rows = await cur.fetchall()
+        await cur.close()
+    for (job_id,) in rows:
+        logging.info(f"Resuming broadcast job {job_id}")
+        start_broadcast_job(bot, job_id)
+
+
+USER_EXPORT_COLUMNS = [
+    "user_id", "username", "first_name", "total_score", "current_level",
+    "correct_streak", "wrong_streak", "created_at", "updated_at",
+    "total_answers", "correct_answers", "last_activity",
+]
+
+# one keyset page of users in signup order, (created_at, user_id) after the
+# given pair, with answer stats aggregated for that page only
+_USER_EXPORT_QUERY = """
+    WITH page AS (
+        SELECT user_id, username, first_name, total_score, current_level,
+               correct_streak, wrong_streak, created_at, updated_at
+        FROM users
+        WHERE (created_at, user_id) > (?, ?)
+        ORDER BY created_at, user_id
+        LIMIT ?
+    )
+    SELECT
+        u.user_id,
+        u.username,
+        u.first_name,
+        u.total_score,
+        u.current_level,
+        u.correct_streak,
+        u.wrong_streak,
+        u.created_at,
+        u.updated_at,
+        COALESCE(agg.total_answers, 0) AS total_answers,
+        COALESCE(agg.correct_answers, 0) AS correct_answers,
+        agg.last_activity
+    FROM page u
+    LEFT JOIN (
+        SELECT
+            user_id,
+            SUM(total_answers) AS total_answers,
+            SUM(correct_answers) AS correct_answers,
+            MAX(last_activity) AS last_activity
+        FROM (
+            SELECT
+                user_id,
+                COUNT(*) AS total_answers,
+                SUM(is_correct) AS correct_answers,
+                MAX(created_at) AS last_activity
+            FROM answers
+            WHERE user_id IN (SELECT user_id FROM page)
+            GROUP BY user_id
+            UNION ALL
+            -- answers already folded away by the retention job
+            SELECT
+                user_id,
+                SUM(total_answers),
+                SUM(correct_answers),
+                MAX(last_activity)
+            FROM answer_user_rollups
+            WHERE user_id IN (SELECT user_id FROM page)
+            GROUP BY user_id
+        )
+        GROUP BY user_id
+    ) agg ON u.user_id = agg.user_id
+    ORDER BY u.created_at, u.user_id
+"""
+
+# rows fetched (and held in memory) at a time by the streaming exports
+EXPORT_CHUNK_ROWS = 1000
+
+
+async def count_users() -> int:
+    async with db_pool.reader() as db:
+        cur = await db.execute("SELECT COUNT(*) FROM users")
+        total = (await cur.fetchone())[0]
+        await cur.close()
+    return total
+
+
+async def iter_users_detailed(chunk_size: int = EXPORT_CHUNK_ROWS):
+    """Yield all users with aggregated answer stats, chunk_size rows at a time.
+
+    Rows are tuples in USER_EXPORT_COLUMNS order. Pages are keyset queries
+    of their own, so no reader is held while a chunk is being uploaded.
+    """
+    await answer_log.flush()
+    last_key = ("", 0)
+    while True:
+        async with db_pool.reader() as db:
+            cur = await db.execute(_USER_EXPORT_QUERY, (*last_key, chunk_size))
+            rows = await cur.fetchall()
+            await cur.close()
+        if not rows:
+            break
+        yield rows
+        last_key = (rows[-1][7], rows[-1][0])
+
+
+class StreamingInputFile(InputFile):
+    """Upload whose bytes come from an async generator, so nothing is staged
+    in memory or on disk."""
+
+    def __init__(self, chunks, filename: str):
+        super().__init__(filename=filename)
+        self._chunks = chunks
+
+    async def read(self, bot: Bot):
+        async with aclosing(self._chunks) as chunks:
+            async for chunk in chunks:
+                yield chunk
+
+
+async def _iter_users_csv(progress: dict, compress: bool = False):
+    """Encode the user export as CSV (optionally gzip), one chunk at a time."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    # gzip container (wbits=31) so the file opens as a regular .csv.gz
+    compressor = zlib.compressobj(wbits=31) if compress else None
+
+    def take() -> bytes:
+        data = buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+        return compressor.compress(data) if compressor else data
+
+    # BOM, like the utf-8-sig files we used to write, so Excel detects UTF-8
+    buffer.write("\ufeff")
+    writer.writerow(USER_EXPORT_COLUMNS)
+    async for rows in iter_users_detailed():
+        writer.writerows(rows)
+        progress["rows"] += len(rows)
+        data = take()
+        if data:
+            yield data
+    data = take()
+    if compressor:
+        data += compressor.flush()
+    if data:
+        yield data
+
+
+async def _export_users_excel(filepath: Path) -> int:
+    # write-only mode streams rows to disk instead of building the sheet in
+    # memory; the xlsx zip itself needs a seekable file, hence filepath
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("Users")
+    ws.append(USER_EXPORT_COLUMNS)
+    count = 0
+
+    def append_rows(rows):
+        for row in rows:
+            ws.append(row)
+
+    async for rows in iter_users_detailed():
+        await asyncio.to_thread(append_rows, rows)
+        count += len(rows)
+    await asyncio.to_thread(wb.save, filepath)
+    return count
+
+
+class _SplitFileWriter:
+    """Write-only file object that rolls over to a new numbered part
+    (name.001, name.002, ...) every max_bytes bytes."""
+
+    def __init__(self, directory: Path, name: str, max_bytes: int = TELEGRAM_UPLOAD_LIMIT):
+        self.directory = directory
+        self.name = name
+        self.max_bytes = max_bytes
+        self.paths: list[Path] = []
+        self._file = None
+        self._written = 0
+
+    def _next_part(self) -> None:
+        if self._file is not None:
+            self._file.close()
+        path = self.directory / f"{self.name}.{len(self.paths) + 1:03d}"
+        self.paths.append(path)
+        self._file = open(path, "wb")
+        self._written = 0
+
+    def write(self, data) -> int:
+        view = memoryview(data)
+        while view:
+            if self._file is None or self._written >= self.max_bytes:
+                self._next_part()
+            n = min(len(view), self.max_bytes - self._written)
+            self._file.write(view[:n])
+            self._written += n
+            view = view[n:]
+        return len(data)
+
+    def flush(self) -> None:
+        if self._file is not None:
+            self._file.flush()
+
+    def close(self) -> list[Path]:
+        """Close the last part and return all part paths in order.
+
+        A single part keeps the plain name (no numeric suffix).
+        """
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        if len(self.paths) == 1:
+            single = self.directory / self.name
+            self.paths[0].rename(single)
+            self.paths = [single]
+        return self.paths
+
+
+def _snapshot_database(directory: Path, progress: dict) -> list[Path]:
+    """Write a gzip'd consistent snapshot of DB_PATH into directory.
+
+    Runs in a worker thread. SQLite's online backup API copies
+    DB_BACKUP_PAGES_PER_STEP pages per step; the source connection keeps one
+    read transaction open across steps, so in WAL mode the copy is a single
+    point-in-time snapshot (WAL contents included) while writers carry on.
+    Returns the upload-sized parts of quiz_bot.db.gz.
+    """
+    snapshot_path = directory / "quiz_bot.db"
+    src = sqlite3.connect(DB_PATH, isolation_level=None)
+    dst = sqlite3.connect(snapshot_path)
+    try:
+        src.execute("BEGIN")
+        src.execute("SELECT COUNT(*) FROM sqlite_master").fetchone()
+
+        def on_step(status, remaining, total):
+            progress["stage"] = "backup"
+            progress["done"] = total - remaining
+            progress["total"] = total
+
+        src.backup(dst, pages=DB_BACKUP_PAGES_PER_STEP, progress=on_step)
+        src.execute("COMMIT")
+    finally:
+        dst.close()
+        src.close()
+
+    progress["stage"] = "compress"
+    progress["done"] = 0
+    progress["total"] = snapshot_path.stat().st_size
+    parts = _SplitFileWriter(directory, "quiz_bot.db.gz")
+    with open(snapshot_path, "rb") as f:
+        with gzip.GzipFile(filename="quiz_bot.db", mode="wb", fileobj=parts) as gz:
+            while chunk := f.read(1024 * 1024):
+                gz.write(chunk)
+                progress["done"] += len(chunk)
+    snapshot_path.unlink()
+    return parts.close()
+
+
+ANSWER_EXPORT_COLUMNS = [
+    "id", "user_id", "word_id", "is_correct", "delta_score",
+    "level", "quiz_mode", "created_at",
+]
+ANSWER_EXPORT_FORMATS = ("csv", "jsonl")
+# zlib may still hold this much unflushed output when a part is rotated
+_GZIP_PART_SLACK = 1024 * 1024
+
+
+def _answers_export_filters(
+        days: int = 0,
+        date_from: str | None = None,
+        date_to: str | None = None,
+        quiz_mode: str | None = None,
+        level: str | None = None) -> dict:
+    """Build export filters; days > 0 means "the last N UTC days, today included".
+
+    date_from/date_to are inclusive YYYY-MM-DD days.
+    """
+    if days > 0:
+        date_from = (datetime.utcnow().date() - timedelta(days=days - 1)).isoformat()
+    end = None
+    if date_to:
+        end = (datetime.fromisoformat(date_to).date() + timedelta(days=1)).isoformat()
+    return {
+        "created_from": date_from,
+        "created_before": end,
+        "quiz_mode": quiz_mode,
+        "level": level,
+    }
+
+
+def _parse_answers_export_args(args: str) -> tuple[dict, str]:
+    """Parse "/export_answers from=YYYY-MM-DD to=YYYY-MM-DD mode=.. level=.. format=csv|jsonl"."""
+    options = {}
+    for token in args.split():
+        key, sep, value = token.partition("=")
+        if not sep or key not in ("from", "to", "mode", "level", "format"):
+            raise ValueError(f"Unknown option: {token}")
+        options[key] = value
+    for key in ("from", "to"):
+        if key in options:
+            try:
+                datetime.strptime(options[key], "%Y-%m-%d")
+            except ValueError:
+                raise ValueError(f"{key}= must be YYYY-MM-DD") from None
+    if options.get("mode") and options["mode"] not in QUIZ_MODES:
+        raise ValueError(f"mode= must be one of: {', '.join(QUIZ_MODES)}")
+    if options.get("level") and options["level"] not in LEVEL_ORDER:
+        raise ValueError(f"level= must be one of: {', '.join(LEVEL_ORDER)}")
+    fmt = options.get("format", "csv")
+    if fmt not in ANSWER_EXPORT_FORMATS:
+        raise ValueError("format= must be csv or jsonl")
+    filters = _answers_export_filters(
+        date_from=options.get("from"),
+        date_to=options.get("to"),
+        quiz_mode=options.get("mode"),
+        level=options.get("level"),
+    )
+    return filters, fmt
+
+
+def _describe_answers_export(filters: dict, fmt: str) -> str:
+    parts = [
+        f"from {filters['created_from'] or 'the beginning'}",
+        f"before {filters['created_before'] or 'now'}",
+    ]
+    if filters["quiz_mode"]:
+        parts.append(f"mode {_quiz_mode_label(filters['quiz_mode'])}")
+    if filters["level"]:
+        parts.append(f"level {filters['level']}")
+    return f"{fmt.upper()}.gz, " + ", ".join(parts)
+
+
+async def iter_answers(filters: dict, chunk_size: int = EXPORT_CHUNK_ROWS):
+    """Yield filtered answers rows in id order, keyset-paginated by id.
+
+    Each chunk is a separate short query, so no read transaction (or
+    connection) is held between chunks.
+    """
+    conditions = ["id > ?"]
+    params: list = []
+    for column, op, key in (
+        ("created_at", ">=", "created_from"),
+        ("created_at", "<", "created_before"),
+        ("quiz_mode", "=", "quiz_mode"),
+        ("level", "=", "level"),
+    ):
+        if filters.get(key):
+            conditions.append(f"{column} {op} ?")
+            params.append(filters[key])
+    query = (
+        f"SELECT {', '.join(ANSWER_EXPORT_COLUMNS)} FROM answers "
+        f"WHERE {' AND '.join(conditions)} ORDER BY id LIMIT ?"
+    )
+    await answer_log.flush()
+    last_id = 0
+    if filters.get("created_from"):
+        # seek to the first row of the range instead of paging through the
+        # older part of the table; the modes let idx_answers_mode_created
+        # serve it
+        modes = [filters["quiz_mode"]] if filters.get("quiz_mode") else QUIZ_MODES
+        async with db_pool.reader() as db:
+            cur = await db.execute(
+                f"SELECT MIN(id) FROM answers "
+                f"WHERE quiz_mode IN ({', '.join('?' * len(modes))}) AND created_at >= ?",
+                (*modes, filters["created_from"]),
+            )
+            first_id = (await cur.fetchone())[0]
+            await cur.close()
+        if first_id is None:
+            return
+        last_id = first_id - 1
+    while True:
+        async with db_pool.reader() as db:
+            cur = await db.execute(query, (last_id, *params, chunk_size))
+            rows = await cur.fetchall()
+            await cur.close()
+        if not rows:
+            break
+        yield rows
+        last_id = rows[-1][0]
+
+
+def _encode_answer_rows(rows: list, fmt: str) -> bytes:
+    if fmt == "jsonl":
+        return "".join(
+            json.dumps(dict(zip(ANSWER_EXPORT_COLUMNS, row)), ensure_ascii=False) + "\n"
+            for row in rows
+        ).encode("utf-8")
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(rows)
+    return buffer.getvalue().encode("utf-8")
+
+
+class _GzipPartsWriter:
+    """Gzip output split into self-contained parts (each a complete .gz file,
+    CSV parts starting with the header) of at most max_bytes each."""
+
+    def __init__(self, directory: Path, name: str, header: bytes = b"",
+                 max_bytes: int = TELEGRAM_UPLOAD_LIMIT):
+        self.directory = directory
+        self.name = name
+        self.header = header
+        self.max_bytes = max_bytes
+        self.paths: list[Path] = []
+        self._raw = None
+        self._gz = None
+
+    def _next_part(self) -> None:
+        self._close_part()
+        path = self.directory / f"{self.name}.part{len(self.paths) + 1:03d}.gz"
+        self.paths.append(path)
+        self._raw = open(path, "wb")
+        self._gz = gzip.GzipFile(filename=self.name, mode="wb", fileobj=self._raw)
+        self._gz.write(self.header)
+
+    def _close_part(self) -> None:
+        if self._gz is not None:
+            self._gz.close()
+            self._raw.close()
+            self._gz = self._raw = None
+
+    def write(self, data: bytes) -> None:
+        # compressed output never exceeds the input by much, so this bound is
+        # safe without flushing zlib (which would hurt the ratio)
+        if self._gz is None or (
+                self._raw.tell() + len(data) + _GZIP_PART_SLACK > self.max_bytes):
+            self._next_part()
+        self._gz.write(data)
+
+    def close(self) -> list[Path]:
+        if self._gz is None:
+            self._next_part()
+        self._close_part()
+        if len(self.paths) == 1:
+            single = self.directory / f"{self.name}.gz"
+            self.paths[0].rename(single)
+            self.paths = [single]
+        return self.paths
+
+
+async def export_answers(filters: dict, fmt: str, directory: Path,
+                         progress: dict) -> list[Path]:
+    """Write the filtered answers log as gzip'd CSV/JSONL parts into directory."""
+    header = b""
+    if fmt == "csv":
+        header = (",".join(ANSWER_EXPORT_COLUMNS) + "\r\n").encode("utf-8")
+    writer = _GzipPartsWriter(directory, f"answers_export.{fmt}", header=header)
+    async for rows in iter_answers(filters):
+        data = _encode_answer_rows(rows, fmt)
+        await asyncio.to_thread(writer.write, data)
+        progress["rows"] += len(rows)
+        progress["last_id"] = rows[-1][0]
+    return await asyncio.to_thread(writer.close)
+
+
+async def run_answers_export(bot: Bot, chat_id: int, status_message: Message,
+                             filters: dict, fmt: str) -> None:
+    """Background job: export answers, keep status_message updated, send the files."""
+    description = _describe_answers_export(filters, fmt)
+    async with db_pool.reader() as db:
+        cur = await db.execute("SELECT COALESCE(MAX(id), 0) FROM answers")
+        max_id = (await cur.fetchone())[0]
+        await cur.close()
+
+    progress = {"rows": 0, "last_id": 0}
+    try:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            job = asyncio.create_task(export_answers(filters, fmt, Path(tmp_dir), progress))
+            while True:
+                done, _ = await asyncio.wait({job}, timeout=3)
+                if done:
+                    break
+                percent = round(min(progress["last_id"] / max_id, 1) * 100, 1) if max_id else 0
+                try:
+                    await status_message.edit_text(
+                        f"⏳ Exporting answers ({description})\n\n"
+                        f"Rows: {progress['rows']}\nProgress: {percent}%"
+                    )
+                except Exception:
+                    pass
+            parts = job.result()
+            for idx, part in enumerate(parts, start=1):
+                caption = f"Part {idx}/{len(parts)}" if len(parts) > 1 else None
+                await bot.send_document(
+                    chat_id=chat_id,
+                    document=FSInputFile(part, filename=part.name),
+                    caption=caption,
+                )
+        text = (
+            f"✅ Answers export complete ({description}).\n"
+            f"Rows: {progress['rows']}, file(s): {len(parts)}"
+        )
+    except Exception as e:
+        logging.exception("Export answers failed")
+        text = f"❌ Export failed: {e}"
+    try:
+        await status_message.edit_text(text, reply_markup=build_admin_keyboard())
+    except Exception:
+        await bot.send_message(chat_id, text, reply_markup=build_admin_keyboard())
+
+
+def build_answers_export_keyboard() -> InlineKeyboardMarkup:
+    ranges = [("📅 Today", 1), ("🗓 7 days", 7), ("🗓 30 days", 30), ("♾ All", 0)]
+    rows = [
+        [
+            InlineKeyboardButton(
+                text=f"{label} — {fmt.upper()}",
+                callback_data=f"admin:ans_export:{days}:{fmt}",
+            )
+            for fmt in ANSWER_EXPORT_FORMATS
+        ]
+        for label, days in ranges
+    ]
+    rows.append([InlineKeyboardButton(text="◀️ Back", callback_data="admin:export")])
+    return InlineKeyboardMarkup(inline_keyboard=rows)
 
 
 def build_admin_keyboard() -> InlineKeyboardMarkup:
@@ -805,12 +4011,27 @@ def build_admin_keyboard() -> InlineKeyboardMarkup:
                     text="📊 통계 보기", callback_data="admin:stats"
                 )
             ],
+            [
+                InlineKeyboardButton(
+                    text="♻️ 통계 재계산", callback_data="admin:rebuild_counters"
+                )
+            ],
+            [
+                InlineKeyboardButton(
+                    text="📚 단어 다시 불러오기", callback_data="admin:reload_words"
+                )
+            ],
             [
                 InlineKeyboardButton(
                     text="📢 모든 사용자에게 메시지 보내기",
                     callback_data="admin:broadcast",
                 )
             ],
+            [
+                InlineKeyboardButton(
+                    text="📋 방송 작업", callback_data="admin:broadcast_jobs"
+                )
+            ],
             [
                 InlineKeyboardButton(
                     text="📥 Export users (Excel/CSV)",
@@ -819,7 +4040,7 @@ def build_admin_keyboard() -> InlineKeyboardMarkup:
             ],
             [
                 InlineKeyboardButton(
-                    text="📦 Export database (quiz_bot.db)",
+                    text="📦 Export database (quiz_bot.db.gz)",
                     callback_data="admin:export_db",
                 )
             ],
@@ -827,6 +4048,26 @@ def build_admin_keyboard() -> InlineKeyboardMarkup:
     )
 
 
+def build_broadcast_job_keyboard(job: dict) -> InlineKeyboardMarkup:
+    prefix = f"admin:bjob:{job['id']}"
+    rows = []
+    if job["status"] == "running":
+        rows.append([
+            InlineKeyboardButton(text="⏸ 일시정지", callback_data=f"{prefix}:pause"),
+            InlineKeyboardButton(text="⛔ 취소", callback_data=f"{prefix}:cancel"),
+        ])
+    elif job["status"] == "paused":
+        rows.append([
+            InlineKeyboardButton(text="▶️ 재개", callback_data=f"{prefix}:resume"),
+            InlineKeyboardButton(text="⛔ 취소", callback_data=f"{prefix}:cancel"),
+        ])
+    rows.append([
+        InlineKeyboardButton(text="🔄 새로고침", callback_data=f"{prefix}:show"),
+        InlineKeyboardButton(text="◀️ Back", callback_data="admin:broadcast_jobs"),
+    ])
+    return InlineKeyboardMarkup(inline_keyboard=rows)
+
+
 def build_export_format_keyboard() -> InlineKeyboardMarkup:
     return InlineKeyboardMarkup(
         inline_keyboard=[
@@ -837,6 +4078,14 @@ def build_export_format_keyboard() -> InlineKeyboardMarkup:
                 InlineKeyboardButton(
                     text="📄 CSV", callback_data="admin:export_csv"
                 ),
+                InlineKeyboardButton(
+                    text="🗜 CSV (.gz)", callback_data="admin:export_csv_gz"
+                ),
+            ],
+            [
+                InlineKeyboardButton(
+                    text="📜 Answers history", callback_data="admin:export_answers"
+                )
             ],
             [
                 InlineKeyboardButton(
@@ -858,50 +4107,42 @@ dp = Dispatcher()
 broadcast_mode: Set[int] = set()
 # хранит сообщения, ожидающие подтверждения: user_id -> broadcast_data
 # broadcast_data = {
-#     "text": str,
-#     "content_type": str,
-#     "message": Message
+#     "chat_id": int,
+#     "message_id": int,
+#     "preview": str,
+#     "segment": dict,  # see _segment_where()
 # }
 pending_broadcasts: dict[int, dict] = {}
 
+# long-running admin jobs; referenced here so they aren't garbage collected
+background_tasks: Set[asyncio.Task] = set()
 
-@dp.message(CommandStart())
-async def cmd_start(message: Message):
-    user = await get_or_create_user(
-        user_id=message.from_user.id,
-        username=message.from_user.username,
-        first_name=message.from_user.first_name,
-    )
 
-    level_ko = user["current_level"]
-    level_map_uz = {
-        LEVEL_BEGINNER: "Boshlang‘ich",
-        LEVEL_INTERMEDIATE: "O‘rta",
-        LEVEL_ADVANCED: "Yuqori",
-    }
-    level_map_ru = {
-        LEVEL_BEGINNER: "Начальный",
-        LEVEL_INTERMEDIATE: "Средний",
-        LEVEL_ADVANCED: "Продвинутый",
-    }
-    level_map_en = {
-        LEVEL_BEGINNER: "Beginner",
-        LEVEL_INTERMEDIATE: "Intermediate",
-        LEVEL_ADVANCED: "Advanced",
-    }
+def _spawn_background(coro) -> asyncio.Task:
+    task = asyncio.create_task(coro)
+    background_tasks.add(task)
+    task.add_done_callback(background_tasks.discard)
+    return task
+
+
+# level names shown in the welcome text: (uz, ru, en)
+LEVEL_NAMES = {
+    LEVEL_BEGINNER: ("Boshlang‘ich", "Начальный", "Beginner"),
+    LEVEL_INTERMEDIATE: ("O‘rta", "Средний", "Intermediate"),
+    LEVEL_ADVANCED: ("Yuqori", "Продвинутый", "Advanced"),
+}
 
-    level_uz = level_map_uz.get(level_ko, level_ko)
-    level_ru = level_map_ru.get(level_ko, level_ko)
-    level_en = level_map_en.get(level_ko, level_ko)
-    score = user["total_score"]
 
+def _render_welcome(level_ko: str) -> str:
+    """Welcome text for a level; the score is left as a {score} field."""
+    level_uz, level_ru, level_en = LEVEL_NAMES.get(level_ko, (level_ko,) * 3)
     welcome = [
         "🇰🇷안녕하세요!",
         "",
         "이 봇은 적응형 한국어 단어 퀴즈 봇입니다.",
         "",
         f"현재 레벨: {level_ko}",
-        f"총 점수: {score}",
+        "총 점수: {score}",
         "",
         "아래 메뉴에서 기능을 선택하세요.",
         "",
@@ -910,7 +4151,7 @@ async def cmd_start(message: Message):
         "Bu bot moslashuvchan koreys tili so‘z viktorinasi botidir.",
         "",
         f"Joriy daraja: {level_uz}",
-        f"Umumiy ball: {score}",
+        "Umumiy ball: {score}",
         "",
         "Quyidagi menyudan kerakli funksiyani tanlang.",
         "",
@@ -919,7 +4160,7 @@ async def cmd_start(message: Message):
         "Этот бот — адаптивный квиз-бот для изучения корейских слов.",
         "",
         f"Текущий уровень: {level_ru}",
-        f"Общий счёт: {score}",
+        "Общий счёт: {score}",
         "",
         "Пожалуйста, выберите нужную функцию в меню ниже.",
         "",
@@ -928,11 +4169,27 @@ async def cmd_start(message: Message):
         "This bot is an adaptive Korean vocabulary quiz bot.",
         "",
         f"Current level: {level_en}",
-        f"Total score: {score}",
+        "Total score: {score}",
         "",
         "Please select a feature from the menu below.",
     ]
-    await message.answer("\n".join(welcome), reply_markup=MAIN_MENU_KB)
+    return "\n".join(welcome)
+
+
+WELCOME_TEXTS = {level: _render_welcome(level) for level in LEVEL_ORDER}
+
+
+@dp.message(CommandStart())
+async def cmd_start(message: Message):
+    user = await get_or_create_user(
+        user_id=message.from_user.id,
+        username=message.from_user.username,
+        first_name=message.from_user.first_name,
+    )
+
+    level = user["current_level"]
+    welcome = WELCOME_TEXTS.get(level) or _render_welcome(level)
+    await message.answer(welcome.format(score=user["total_score"]), reply_markup=MAIN_MENU_KB)
 
 
 @dp.message(F.text == "🔠퀴즈")
@@ -960,23 +4217,24 @@ async def handle_quiz_level_selected(callback: CallbackQuery):
         await callback.answer("잘못된 선택입니다.", show_alert=True)
         return
     await callback.answer()
-    user = await get_or_create_user(
-        user_id=callback.from_user.id,
-        username=callback.from_user.username,
-        first_name=callback.from_user.first_name,
-    )
-    try:
-        await callback.message.edit_reply_markup(reply_markup=None)
-    except Exception:
-        pass
-    user_state = {
-        "user_id": user["user_id"],
-        "current_level": user["current_level"],
-        "total_score": user["total_score"],
-        "correct_streak": user["correct_streak"],
-        "wrong_streak": user["wrong_streak"],
-    }
-    await send_quiz_question(callback.message, user_state, quiz_mode)
+    async with user_locks.hold(callback.from_user.id):
+        user = await get_or_create_user(
+            user_id=callback.from_user.id,
+            username=callback.from_user.username,
+            first_name=callback.from_user.first_name,
+        )
+        try:
+            await callback.message.edit_reply_markup(reply_markup=None)
+        except Exception:
+            pass
+        user_state = {
+            "user_id": user["user_id"],
+            "current_level": user["current_level"],
+            "total_score": user["total_score"],
+            "correct_streak": user["correct_streak"],
+            "wrong_streak": user["wrong_streak"],
+        }
+        await send_quiz_question(callback.message, user_state, quiz_mode)
 
 
 @dp.message(F.text == "📊랭킹")
@@ -1047,6 +4305,45 @@ async def handle_admin_stats(callback: CallbackQuery):
     await callback.answer()
 
 
+@dp.callback_query(F.data == "admin:rebuild_counters")
+async def handle_admin_rebuild_counters(callback: CallbackQuery):
+    if not is_admin(callback.from_user.username):
+        await callback.answer("❌ 권한이 없습니다.", show_alert=True)
+        return
+
+    await callback.answer("통계를 재계산하는 중...")
+    await callback.message.edit_text("⏳ 통계를 재계산하는 중...")
+    try:
+        await rebuild_counters()
+        text = "✅ 통계 재계산 완료\n\n" + await format_statistics_text()
+    except Exception as e:
+        logging.exception("Rebuilding counters failed")
+        text = f"❌ 재계산 실패: {e}"
+    await callback.message.edit_text(text, reply_markup=build_admin_keyboard())
+
+
+@dp.callback_query(F.data == "admin:reload_words")
+async def handle_admin_reload_words(callback: CallbackQuery):
+    if not is_admin(callback.from_user.username):
+        await callback.answer("❌ 권한이 없습니다.", show_alert=True)
+        return
+
+    await callback.answer("단어를 불러오는 중...")
+    await callback.message.edit_text("⏳ 단어를 불러오는 중...")
+    try:
+        result = await load_words()
+        text = (
+            f"✅ 단어 다시 불러오기 완료\n\n"
+            f"전체: {result['total']}개\n"
+            f"추가: {result['added']}개\n"
+            f"제외: {result['retired']}개"
+        )
+    except Exception as e:
+        logging.exception("Reloading words failed")
+        text = f"❌ 불러오기 실패 (기존 단어 유지): {e}"
+    await callback.message.edit_text(text, reply_markup=build_admin_keyboard())
+
+
 @dp.callback_query(F.data == "admin:export")
 async def handle_admin_export(callback: CallbackQuery):
     if not is_admin(callback.from_user.username):
@@ -1062,6 +4359,69 @@ async def handle_admin_export(callback: CallbackQuery):
     await callback.answer()
 
 
+@dp.callback_query(F.data == "admin:export_answers")
+async def handle_admin_export_answers(callback: CallbackQuery):
+    if not is_admin(callback.from_user.username):
+        await callback.answer("❌ 권한이 없습니다.", show_alert=True)
+        return
+
+    text = (
+        "📜 Export answers history\n\n"
+        "Pick a date range and format (gzip'd CSV or JSONL). Columns: "
+        f"{', '.join(ANSWER_EXPORT_COLUMNS)}.\n\n"
+        "For other ranges or mode/level filters use:\n"
+        "/export_answers from=YYYY-MM-DD to=YYYY-MM-DD mode=ai level=초급 format=jsonl"
+    )
+    await callback.message.edit_text(text, reply_markup=build_answers_export_keyboard())
+    await callback.answer()
+
+
+@dp.callback_query(F.data.startswith("admin:ans_export:"))
+async def handle_admin_answers_export_preset(callback: CallbackQuery):
+    if not is_admin(callback.from_user.username):
+        await callback.answer("❌ 권한이 없습니다.", show_alert=True)
+        return
+
+    try:
+        _, _, days, fmt = callback.data.split(":")
+        days = int(days)
+    except ValueError:
+        await callback.answer("잘못된 선택입니다.", show_alert=True)
+        return
+    if fmt not in ANSWER_EXPORT_FORMATS:
+        await callback.answer("잘못된 선택입니다.", show_alert=True)
+        return
+
+    await callback.answer("Export started")
+    filters = _answers_export_filters(days=days)
+    await callback.message.edit_text(
+        f"⏳ Exporting answers ({_describe_answers_export(filters, fmt)})...")
+    _spawn_background(run_answers_export(
+        callback.bot, callback.from_user.id, callback.message, filters, fmt))
+
+
+@dp.message(Command("export_answers"))
+async def cmd_export_answers(message: Message, command: CommandObject):
+    if not is_admin(message.from_user.username):
+        await message.answer("❌ 권한이 없습니다.")
+        return
+
+    try:
+        filters, fmt = _parse_answers_export_args(command.args or "")
+    except ValueError as e:
+        await message.answer(
+            f"❌ {e}\n\n"
+            "Usage: /export_answers from=YYYY-MM-DD to=YYYY-MM-DD "
+            f"mode={'|'.join(QUIZ_MODES)} level={'|'.join(LEVEL_ORDER)} format=csv|jsonl"
+        )
+        return
+
+    status_message = await message.answer(
+        f"⏳ Exporting answers ({_describe_answers_export(filters, fmt)})...")
+    _spawn_background(run_answers_export(
+        message.bot, message.from_user.id, status_message, filters, fmt))
+
+
 @dp.callback_query(F.data == "admin:export_back")
 async def handle_admin_export_back(callback: CallbackQuery):
     if not is_admin(callback.from_user.username):
@@ -1083,8 +4443,7 @@ async def handle_admin_export_excel(callback: CallbackQuery):
     await callback.message.edit_text("⏳ Generating Excel file...")
 
     try:
-        rows = await get_all_users_detailed()
-        if not rows:
+        if not await count_users():
             await callback.message.edit_text(
                 "No users to export.",
                 reply_markup=build_admin_keyboard(),
@@ -1097,17 +4456,17 @@ async def handle_admin_export_excel(callback: CallbackQuery):
         except Exception:
             pass
         path = Path(path_str)
-        _export_users_excel(rows, path)
         try:
-            with open(path, "rb") as f:
-                await callback.bot.send_document(
-                    chat_id=callback.from_user.id,
-                    document=BufferedInputFile(f.read(), filename="users_export.xlsx"),
-                )
+            exported = await _export_users_excel(path)
+            # FSInputFile uploads the file in chunks, no read-back copy
+            await callback.bot.send_document(
+                chat_id=callback.from_user.id,
+                document=FSInputFile(path, filename="users_export.xlsx"),
+            )
         finally:
             path.unlink(missing_ok=True)
 
-        text = f"✅ Export complete. Sent Excel file with {len(rows)} users."
+        text = f"✅ Export complete. Sent Excel file with {exported} users."
         await callback.message.edit_text(text, reply_markup=build_admin_keyboard())
     except Exception as e:
         logging.exception("Export Excel failed")
@@ -1117,41 +4476,34 @@ async def handle_admin_export_excel(callback: CallbackQuery):
         )
 
 
-@dp.callback_query(F.data == "admin:export_csv")
+@dp.callback_query(F.data.in_({"admin:export_csv", "admin:export_csv_gz"}))
 async def handle_admin_export_csv(callback: CallbackQuery):
     if not is_admin(callback.from_user.username):
         await callback.answer("❌ 권한이 없습니다.", show_alert=True)
         return
 
+    compress = callback.data == "admin:export_csv_gz"
     await callback.answer("Generating CSV file...")
     await callback.message.edit_text("⏳ Generating CSV file...")
 
     try:
-        rows = await get_all_users_detailed()
-        if not rows:
+        if not await count_users():
             await callback.message.edit_text(
                 "No users to export.",
                 reply_markup=build_admin_keyboard(),
             )
             return
 
-        fd, path_str = tempfile.mkstemp(suffix=".csv")
-        try:
-            os.close(fd)
-        except Exception:
-            pass
-        path = Path(path_str)
-        _export_users_csv(rows, path)
-        try:
-            with open(path, "rb") as f:
-                await callback.bot.send_document(
-                    chat_id=callback.from_user.id,
-                    document=BufferedInputFile(f.read(), filename="users_export.csv"),
-                )
-        finally:
-            path.unlink(missing_ok=True)
+        # rows are encoded while they are uploaded
+        progress = {"rows": 0}
+        filename = "users_export.csv.gz" if compress else "users_export.csv"
+        await callback.bot.send_document(
+            chat_id=callback.from_user.id,
+            document=StreamingInputFile(
+                _iter_users_csv(progress, compress=compress), filename=filename),
+        )
 
-        text = f"✅ Export complete. Sent CSV file with {len(rows)} users."
+        text = f"✅ Export complete. Sent CSV file with {progress['rows']} users."
         await callback.message.edit_text(text, reply_markup=build_admin_keyboard())
     except Exception as e:
         logging.exception("Export CSV failed")
@@ -1161,6 +4513,16 @@ async def handle_admin_export_csv(callback: CallbackQuery):
         )
 
 
+def _format_db_export_progress(progress: dict) -> str:
+    total = progress.get("total") or 0
+    percent = round(progress.get("done", 0) / total * 100, 1) if total else 0
+    stage = {
+        "backup": "📸 Snapshot",
+        "compress": "🗜 Compressing",
+    }.get(progress.get("stage"), "⏳ Preparing")
+    return f"⏳ Preparing database file...\n\n{stage}: {percent}%"
+
+
 @dp.callback_query(F.data == "admin:export_db")
 async def handle_admin_export_db(callback: CallbackQuery):
     if not is_admin(callback.from_user.username):
@@ -1179,15 +4541,43 @@ async def handle_admin_export_db(callback: CallbackQuery):
             )
             return
 
-        with open(db_path, "rb") as f:
-            data = f.read()
+        # make sure buffered answers are part of the snapshot
+        await answer_log.flush()
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            progress: dict = {}
+            snapshot = asyncio.create_task(
+                asyncio.to_thread(_snapshot_database, Path(tmp_dir), progress))
+            last_text = None
+            while True:
+                done, _ = await asyncio.wait({snapshot}, timeout=3)
+                if done:
+                    break
+                text = _format_db_export_progress(progress)
+                if text != last_text:
+                    try:
+                        await callback.message.edit_text(text)
+                        last_text = text
+                    except Exception:
+                        pass
+            parts = snapshot.result()
+
+            for idx, part in enumerate(parts, start=1):
+                caption = None
+                if len(parts) > 1:
+                    caption = (
+                        f"Part {idx}/{len(parts)}. Join with: "
+                        f"cat quiz_bot.db.gz.* > quiz_bot.db.gz"
+                    )
+                    await callback.message.edit_text(
+                        f"📤 Sending part {idx}/{len(parts)}...")
+                await callback.bot.send_document(
+                    chat_id=callback.from_user.id,
+                    document=FSInputFile(part, filename=part.name),
+                    caption=caption,
+                )
 
-        await callback.bot.send_document(
-            chat_id=callback.from_user.id,
-            document=BufferedInputFile(data, filename="quiz_bot.db"),
-        )
         await callback.message.edit_text(
-            "✅ Database export complete. Sent quiz_bot.db",
+            f"✅ Database export complete. Sent quiz_bot.db.gz ({len(parts)} file(s))",
             reply_markup=build_admin_keyboard(),
         )
     except Exception as e:
@@ -1231,12 +4621,21 @@ async def handle_admin_broadcast_confirm(callback: CallbackQuery):
             pending_broadcasts.pop(callback.from_user.id, None)
             return
 
+        broadcast_mode.discard(callback.from_user.id)
+        pending_broadcasts.pop(callback.from_user.id, None)
         await callback.message.edit_text("⏳ 메시지를 보내는 중...")
         await callback.answer()
 
-        await send_broadcast(callback.bot, callback.from_user.id, broadcast_data)
-        broadcast_mode.discard(callback.from_user.id)
-        pending_broadcasts.pop(callback.from_user.id, None)
+        # the job is sent in the background and survives restarts
+        job_id = await create_broadcast_job(
+            callback.from_user.id,
+            broadcast_data["chat_id"],
+            broadcast_data["message_id"],
+            status_message_id=callback.message.message_id,
+            segment=broadcast_data["segment"],
+        )
+        await show_broadcast_job(callback.bot, job_id)
+        start_broadcast_job(callback.bot, job_id)
     else:
         broadcast_mode.discard(callback.from_user.id)
         pending_broadcasts.pop(callback.from_user.id, None)
@@ -1246,232 +4645,225 @@ async def handle_admin_broadcast_confirm(callback: CallbackQuery):
         await callback.answer("취소되었습니다.")
 
 
-async def send_broadcast(bot: Bot, admin_id: int, broadcast_data: dict):
-    user_ids = await get_all_user_ids()
-    total = len(user_ids)
-    success = 0
-    failed = 0
-
-    status_message = await bot.send_message(
-        admin_id,
-        f"📤 메시지 전송 중...\n\n전체: {total}명\n성공: {success}명\n실패: {failed}명"
-    )
-
-    message_text = broadcast_data.get("text", "")
-    content_type = broadcast_data.get("content_type", "text")
-    original_message = broadcast_data.get("message")
+@dp.callback_query(F.data == "admin:broadcast_jobs")
+async def handle_admin_broadcast_jobs(callback: CallbackQuery):
+    if not is_admin(callback.from_user.username):
+        await callback.answer("❌ 권한이 없습니다.", show_alert=True)
+        return
 
-    for idx, user_id in enumerate(user_ids, 1):
-        try:
-            if content_type == "text":
-                await bot.send_message(user_id, message_text)
-            elif content_type == "photo" and original_message:
-                await bot.send_photo(
-                    user_id,
-                    photo=original_message.photo[-1].file_id,
-                    caption=message_text if message_text else None
-                )
-            elif content_type == "video" and original_message:
-                await bot.send_video(
-                    user_id,
-                    video=original_message.video.file_id,
-                    caption=message_text if message_text else None
-                )
-            elif content_type == "document" and original_message:
-                await bot.send_document(
-                    user_id,
-                    document=original_message.document.file_id,
-                    caption=message_text if message_text else None
-                )
-            elif content_type == "audio" and original_message:
-                await bot.send_audio(
-                    user_id,
-                    audio=original_message.audio.file_id,
-                    caption=message_text if message_text else None
-                )
-            elif content_type == "voice" and original_message:
-                await bot.send_voice(
-                    user_id,
-                    voice=original_message.voice.file_id,
-                    caption=message_text if message_text else None
-                )
-            else:
-                # fallback to text
-                if message_text:
-                    await bot.send_message(user_id, message_text)
+    jobs = await get_recent_broadcast_jobs()
+    rows = []
+    for job in jobs:
+        processed = job["sent"] + job["blocked"] + job["failed"]
+        rows.append([
+            InlineKeyboardButton(
+                text=(
+                    f"#{job['id']} {BROADCAST_STATUS_LABELS.get(job['status'], job['status'])} "
+                    f"{processed}/{job['total']}"
+                ),
+                callback_data=f"admin:bjob:{job['id']}:show",
+            )
+        ])
+    rows.append([InlineKeyboardButton(text="◀️ Back", callback_data="admin:export_back")])
+    text = "📋 방송 작업\n\n" + ("작업을 선택하세요." if jobs else "방송 작업이 없습니다.")
+    await callback.message.edit_text(text, reply_markup=InlineKeyboardMarkup(inline_keyboard=rows))
+    await callback.answer()
 
-            success += 1
-        except Exception as e:
-            failed += 1
-            error_msg = str(e)
-            if (
-                "blocked" in error_msg.lower()
-                or "chat not found" in error_msg.lower()
-                or "user is deactivated" in error_msg.lower()
-            ):
-                await mark_user_blocked(user_id)
-            else:
-                logging.warning(f"Failed to send message to {user_id}: {e}")
 
-        # обновляем статус каждые 10 сообщений или в конце
-        if idx % 10 == 0 or idx == total:
-            try:
-                await status_message.edit_text(
-                    f"📤 메시지 전송 중...\n\n"
-                    f"전체: {total}명\n"
-                    f"성공: {success}명\n"
-                    f"실패: {failed}명\n"
-                    f"진행률: {idx}/{total} ({round(idx/total*100, 1)}%)"
-                )
-            except BaseException:
-                pass
+@dp.callback_query(F.data.startswith("admin:bjob:"))
+async def handle_admin_broadcast_job(callback: CallbackQuery):
+    if not is_admin(callback.from_user.username):
+        await callback.answer("❌ 권한이 없습니다.", show_alert=True)
+        return
 
-        # небольшая задержка, чтобы не превысить лимиты API
-        if idx % 30 == 0:
-            await asyncio.sleep(1)
-
-    # финальное сообщение
-    final_text = (
-        f"✅ 메시지 전송 완료!\n\n"
-        f"📊 통계:\n"
-        f"• 전체: {total}명\n"
-        f"• 성공: {success}명\n"
-        f"• 실패: {failed}명\n"
-        f"• 성공률: {round(success/total*100, 1) if total > 0 else 0}%"
-    )
-    kb = build_admin_keyboard()
+    try:
+        _, _, job_id, action = callback.data.split(":")
+        job_id = int(job_id)
+    except ValueError:
+        await callback.answer("잘못된 선택입니다.", show_alert=True)
+        return
 
+    notice = None
+    if action == "pause":
+        if await set_broadcast_job_status(job_id, "paused"):
+            notice = "현재 배치 후 일시정지됩니다."
+    elif action == "cancel":
+        if await set_broadcast_job_status(job_id, "cancelled"):
+            notice = "현재 배치 후 취소됩니다."
+    elif action == "resume":
+        if await set_broadcast_job_status(job_id, "running"):
+            start_broadcast_job(callback.bot, job_id)
+            notice = "재개되었습니다."
+
+    job = await get_broadcast_job(job_id)
+    if not job:
+        await callback.answer("❌ 작업을 찾을 수 없습니다.", show_alert=True)
+        return
     try:
-        await status_message.edit_text(final_text, reply_markup=kb)
-    except BaseException:
-        await bot.send_message(admin_id, final_text, reply_markup=kb)
+        await callback.message.edit_text(
+            format_broadcast_job(job), reply_markup=build_broadcast_job_keyboard(job)
+        )
+    except TelegramBadRequest:
+        pass
+    await callback.answer(notice)
 
 
 @dp.callback_query(F.data.startswith("ans:"))
 async def handle_answer(callback: CallbackQuery):
     parts = callback.data.split(":")
-    if len(parts) != 4:
+    if len(parts) == 4:
+        # keyboards sent before options were drawn per question
+        await callback.answer("이 문항은 더 이상 유효하지 않습니다.", show_alert=True)
+        return
+    if len(parts) != 5:
         await callback.answer("잘못된 응답입니다.", show_alert=True)
         return
 
     try:
         word_id = int(parts[1])
         selected_index = int(parts[2])
-        quiz_mode = parts[3]
-    except (ValueError, IndexError):
+    except ValueError:
         await callback.answer("잘못된 응답입니다.", show_alert=True)
         return
+    quiz_mode = parts[3]
 
     if quiz_mode not in QUIZ_MODES:
         await callback.answer("잘못된 응답입니다.", show_alert=True)
         return
 
+    correct_index = answer_correct_index(word_id, selected_index, quiz_mode, parts[4])
+    if correct_index is None:
+        # forged or tampered with
+        await callback.answer("이 문항은 더 이상 유효하지 않습니다.", show_alert=True)
+        return
+
     word = WORDS_BY_ID.get(word_id)
     if not word:
         await callback.answer("이 문항은 더 이상 유효하지 않습니다.", show_alert=True)
         return
 
-    user = await get_or_create_user(
-        user_id=callback.from_user.id,
-        username=callback.from_user.username,
-        first_name=callback.from_user.first_name,
-    )
-
-    correct_index = word["correct_index"]
     is_correct = selected_index == correct_index
-    delta_score = 1 if is_correct else -1
+    user = callback.from_user
+    question = (callback.message.chat.id, callback.message.message_id)
+    # a second tap on the same question (any button) changes nothing
+    if not answered_questions.claim(question):
+        await callback.answer("이미 답한 문항입니다.")
+        return
+    # stop the button spinner before waiting for the user's earlier answers;
+    # scoring happens in the background
+    await callback.answer()
 
-    if quiz_mode == QUIZ_MODE_AI:
-        total_score = user["total_score"] + delta_score
-        if total_score < 0:
-            total_score = 0
-        correct_streak = user["correct_streak"]
-        wrong_streak = user["wrong_streak"]
+    async with user_locks.hold(user.id):
+        level_label = _quiz_mode_emoji_label(quiz_mode)
         if is_correct:
-            correct_streak += 1
-            wrong_streak = 0
+            feedback = f"✅ 정답입니다!\n\n{level_label} +1💎"
         else:
-            wrong_streak += 1
-            correct_streak = 0
-        current_level = user["current_level"]
-        new_level = get_next_level_on_streak(
-            current_level, correct_streak, wrong_streak)
-        level_changed = new_level != current_level
-        level_change_message = None
-        if level_changed:
-            if LEVEL_ORDER.index(new_level) > LEVEL_ORDER.index(current_level):
-                level_change_message = f"🎉 수준 상승! {current_level} → {new_level}"
-            else:
-                level_change_message = f"📉 수준 하락. {current_level} → {new_level}"
-            correct_streak = 0
-            wrong_streak = 0
-            current_level = new_level
-        await update_user_stats(
-            user_id=user["user_id"],
-            total_score=total_score,
-            current_level=current_level,
-            correct_streak=correct_streak,
-            wrong_streak=wrong_streak,
-        )
-    else:
-        level_changed = False
-        level_change_message = None
-        current_level = quiz_mode
-
-    await update_level_score(user["user_id"], quiz_mode, delta_score)
-    display_score = await get_level_score(user["user_id"], quiz_mode)
-
-    await log_answer(
-        user_id=user["user_id"],
-        word_id=word_id,
-        is_correct=is_correct,
-        delta_score=delta_score,
-        level=current_level if quiz_mode == QUIZ_MODE_AI else word["level"],
-        quiz_mode=quiz_mode,
-    )
-
-    user_rank_info = await get_user_rank_by_mode(user["user_id"], quiz_mode)
-    level_label = _quiz_mode_emoji_label(quiz_mode)
-    rank_line = ""
-    if user_rank_info:
-        rank, _, _ = user_rank_info
-        rank_line = f"\n📈내 {level_label} 순위: {rank} 위"
-    score_line = f"\n📊내 {level_label} 점수: {display_score}💎{rank_line}"
+            correct_option_text = _pretty_korean_word(word["korean"])
+            feedback = (
+                "❌ 틀렸습니다.\n\n"
+                f"정답: {correct_index+1}) {correct_option_text}\n\n"
+                f"{level_label} -1💎"
+            )
 
-    if is_correct:
-        feedback = f"✅ 정답입니다!\n\n{level_label} +1💎\n" + score_line
-    else:
-        correct_option_text = word["options"][correct_index]
-        feedback = (
-            "❌ 틀렸습니다.\n\n"
-            f"정답: {correct_index+1}) {correct_option_text}\n\n"
-            f"{level_label} -1💎\n{score_line}"
-        )
+        try:
+            await callback.message.edit_reply_markup(reply_markup=None)
+        except TelegramBadRequest:
+            pass
+        # no reply_markup: Telegram can't edit a message sent with a reply
+        # keyboard, and the main menu stays up anyway
+        feedback_message = await callback.message.answer(feedback)
 
-    if level_changed and level_change_message:
-        feedback += f"\n\n{level_change_message}"
+        answer_pipelines.submit(user.id, lambda: finish_answer(
+            callback.message, feedback_message, feedback, question, user.id,
+            user.username, user.first_name, word_id, word["level"], quiz_mode, is_correct))
 
-    await callback.message.edit_reply_markup(reply_markup=None)
-    await callback.message.answer(feedback, reply_markup=MAIN_MENU_KB)
-    await callback.answer()
 
-    if quiz_mode == QUIZ_MODE_AI:
-        user_state = {
-            "user_id": user["user_id"],
-            "current_level": current_level,
-            "total_score": total_score,
-            "correct_streak": correct_streak,
-            "wrong_streak": wrong_streak,
-        }
-    else:
-        user_state = {
-            "user_id": user["user_id"],
-            "current_level": user["current_level"],
-            "total_score": user["total_score"],
-            "correct_streak": user["correct_streak"],
-            "wrong_streak": user["wrong_streak"],
-        }
-    await send_quiz_question(callback.message, user_state, quiz_mode)
+async def finish_answer(
+        question_message: Message,
+        feedback_message: Message,
+        feedback: str,
+        question: tuple[int, int],
+        user_id: int,
+        username: str | None,
+        first_name: str | None,
+        word_id: int,
+        word_level: str,
+        quiz_mode: str,
+        is_correct: bool):
+    """Score an answer whose feedback is already out (runs on the user's
+    pipeline): persist it, add score and rank to the feedback, then send
+    the next question."""
+    async with user_locks.hold(user_id):
+        saved = False
+        result = None
+        for attempt in range(ANSWER_PERSIST_ATTEMPTS):
+            try:
+                result = await record_answer(
+                    user_id=user_id,
+                    username=username,
+                    first_name=first_name,
+                    word_id=word_id,
+                    word_level=word_level,
+                    quiz_mode=quiz_mode,
+                    is_correct=is_correct,
+                    question=question,
+                )
+                saved = True
+                break
+            except sqlite3.OperationalError:
+                # busy/locked is worth another try; anything else is a bug
+                # and goes straight up to the pipeline, which logs it
+                logging.warning(
+                    f"Saving answer of user {user_id} failed "
+                    f"(attempt {attempt + 1}/{ANSWER_PERSIST_ATTEMPTS})",
+                    exc_info=True,
+                )
+                if attempt + 1 < ANSWER_PERSIST_ATTEMPTS:
+                    await asyncio.sleep(0.5 * 2 ** attempt)
+
+        if not saved:
+            logging.error(f"Gave up saving the answer of user {user_id} to {question}")
+            feedback += "\n\n⚠️ 답변을 저장하지 못해 점수에 반영되지 않았습니다."
+        elif result is None and attempt == 0:
+            # scored before a restart emptied answered_questions' cache
+            try:
+                await feedback_message.edit_text("이미 답한 문항입니다.")
+            except TelegramBadRequest:
+                logging.warning(f"Can't correct the feedback of user {user_id}", exc_info=True)
+            return
+        elif result is not None:
+            level_label = _quiz_mode_emoji_label(quiz_mode)
+            rank_line = ""
+            if result["rank"] is not None:
+                rank_line = f"\n📈내 {level_label} 순위: {result['rank']} 위"
+            feedback += f"\n\n📊내 {level_label} 점수: {result['level_score']}💎{rank_line}"
+            if result["level_changed"]:
+                previous_level = result["previous_level"]
+                new_level = result["current_level"]
+                if LEVEL_ORDER.index(new_level) > LEVEL_ORDER.index(previous_level):
+                    feedback += f"\n\n🎉 수준 상승! {previous_level} → {new_level}"
+                else:
+                    feedback += f"\n\n📉 수준 하락. {previous_level} → {new_level}"
+        # result None after a retry: an earlier attempt committed before it
+        # failed, so the answer counts but there is no score to show
+        if not saved or result is not None:
+            try:
+                await feedback_message.edit_text(feedback)
+            except TelegramBadRequest:
+                logging.warning(f"Can't update the feedback of user {user_id}", exc_info=True)
+
+        if result is not None:
+            user_state = {
+                "user_id": result["user_id"],
+                "current_level": result["current_level"],
+                "total_score": result["total_score"],
+                "correct_streak": result["correct_streak"],
+                "wrong_streak": result["wrong_streak"],
+            }
+        else:
+            user_state = await get_or_create_user(user_id, username, first_name)
+        # keep the quiz going even if this answer was lost
+        await send_quiz_question(question_message, user_state, quiz_mode)
 
 
 @dp.message(Command("cancel"))
@@ -1533,33 +4925,94 @@ async def handle_broadcast_message(message: Message):
     else:
         preview_text += f"{message_text}\n"
 
-    preview_text += (
-        f"\n이 메시지를 모든 사용자에게 보내시겠습니까?\n\n"
-        f"⚠️ 주의: 이 작업은 취소할 수 없습니다."
+    # сохраняем ссылку на сообщение: рассылка копирует его через copy_message
+    broadcast_data = {
+        "chat_id": message.chat.id,
+        "message_id": message.message_id,
+        "preview": preview_text,
+        "segment": {},
+    }
+    pending_broadcasts[message.from_user.id] = broadcast_data
+
+    text, kb = await render_broadcast_preview(broadcast_data)
+    await message.answer(text, reply_markup=kb)
+
+
+async def render_broadcast_preview(broadcast_data: dict) -> tuple[str, InlineKeyboardMarkup]:
+    """Preview text with the audience size, segment toggles and confirm buttons."""
+    segment = broadcast_data["segment"]
+    audience = await count_segment(segment)
+    text = broadcast_data["preview"] + (
+        f"\n👥 대상: {describe_segment(segment)}\n"
+        f"받는 사람: {audience}명\n\n"
+        f"이 메시지를 보내시겠습니까?\n\n"
+        f"⚠️ 주의: 전송 중에는 '📋 방송 작업'에서 일시정지/취소할 수 있습니다. "
+        f"이 메시지를 삭제하지 마세요 (방송은 이 메시지를 복사합니다)."
     )
 
-    confirm_kb = InlineKeyboardMarkup(
+    active_days = segment.get("active_days")
+    level = segment.get("level")
+    quiz_mode = segment.get("quiz_mode")
+    min_score = segment.get("min_score")
+    kb = InlineKeyboardMarkup(
         inline_keyboard=[
             [
                 InlineKeyboardButton(
-                    text="✅ 전송", callback_data=f"admin:broadcast_confirm:yes"
+                    text=f"🕒 활동: {f'{active_days}일' if active_days else '전체'}",
+                    callback_data="admin:bseg:active_days",
                 ),
                 InlineKeyboardButton(
-                    text="❌ 취소", callback_data=f"admin:broadcast_confirm:no"
+                    text=f"📚 레벨: {level or '전체'}",
+                    callback_data="admin:bseg:level",
                 ),
-            ]
+            ],
+            [
+                InlineKeyboardButton(
+                    text=f"🎮 모드: {_quiz_mode_label(quiz_mode) if quiz_mode else '전체'}",
+                    callback_data="admin:bseg:quiz_mode",
+                ),
+                InlineKeyboardButton(
+                    text=f"🏅 점수: {f'{min_score}+' if min_score else '전체'}",
+                    callback_data="admin:bseg:min_score",
+                ),
+            ],
+            [
+                InlineKeyboardButton(
+                    text="✅ 전송", callback_data="admin:broadcast_confirm:yes"
+                ),
+                InlineKeyboardButton(
+                    text="❌ 취소", callback_data="admin:broadcast_confirm:no"
+                ),
+            ],
         ]
     )
+    return text, kb
 
-    # сохраняем информацию о сообщении для рассылки
-    broadcast_data = {
-        "text": message_text,
-        "content_type": content_type,
-        "message": message,  # сохраняем объект сообщения для копирования медиа
-    }
-    pending_broadcasts[message.from_user.id] = broadcast_data
 
-    await message.answer(preview_text, reply_markup=confirm_kb)
+@dp.callback_query(F.data.startswith("admin:bseg:"))
+async def handle_admin_broadcast_segment(callback: CallbackQuery):
+    if not is_admin(callback.from_user.username):
+        await callback.answer("❌ 권한이 없습니다.", show_alert=True)
+        return
+
+    broadcast_data = pending_broadcasts.get(callback.from_user.id)
+    field = callback.data.split(":")[-1]
+    if not broadcast_data or field not in BROADCAST_SEGMENT_OPTIONS:
+        await callback.answer("❌ 메시지를 찾을 수 없습니다.", show_alert=True)
+        return
+
+    # cycle to the next value of this filter
+    options = BROADCAST_SEGMENT_OPTIONS[field]
+    current = broadcast_data["segment"].get(field)
+    value = options[(options.index(current) + 1) % len(options)]
+    if value is None:
+        broadcast_data["segment"].pop(field, None)
+    else:
+        broadcast_data["segment"][field] = value
+
+    text, kb = await render_broadcast_preview(broadcast_data)
+    await callback.message.edit_text(text, reply_markup=kb)
+    await callback.answer()
 
 
 @dp.message()
@@ -1584,16 +5037,46 @@ async def fallback_message(message: Message):
 
 
 async def main():
+    global db_pool, answer_log
     logging.basicConfig(level=logging.INFO)
-    await init_db()
 
     if not BOT_TOKEN:
         raise RuntimeError(
             "Set BOT_TOKEN environment variable (e.g. in Railway: Variables tab)."
         )
 
-    bot = Bot(token=BOT_TOKEN)
-    await dp.start_polling(bot)
+    db_pool = DatabasePool(DB_PATH, readers=DB_READERS)
+    await db_pool.open()
+    answer_log = AnswerLogBuffer()
+    leaderboard_checks = None
+    answers_retention = None
+    answered_pruning = None
+    words_watch = None
+    try:
+        await init_db()
+        # a large deck takes a while to index; load_words keeps it off the loop
+        await load_words()
+        await warm_leaderboards()
+        answer_log.start()
+        leaderboard_checks = asyncio.create_task(run_leaderboard_checks())
+        if ANSWERS_RETENTION_DAYS > 0:
+            answers_retention = asyncio.create_task(run_answers_retention())
+        answered_pruning = asyncio.create_task(run_answered_questions_pruning())
+        if WORDS_WATCH_INTERVAL > 0:
+            words_watch = asyncio.create_task(run_words_watch())
+        bot = Bot(token=BOT_TOKEN)
+        await resume_broadcast_jobs(bot)
+        await dp.start_polling(bot)
+    finally:
+        for task in (leaderboard_checks, answers_retention, answered_pruning, words_watch,
+                     *background_tasks):
+            if task is not None:
+                task.cancel()
+        # let broadcasts/exports unwind before the pool closes
+        await asyncio.gather(*background_tasks, return_exceptions=True)
+        await answer_pipelines.close()
+        await answer_log.close()
+        await db_pool.close()
 
 
 if __name__ == "__main__":